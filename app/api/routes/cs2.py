@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Header, Query, HTTPException, Response, WebSocket, status
 from fastapi.encoders import jsonable_encoder
 
 from services.cs2_service import CS2Service
@@ -14,11 +14,41 @@ auth_service = AuthService()
     "/servers",
     response_model=ServerResponse,
     responses={
+        304: {"description": "Not Modified"},
+        400: {"model": ErrorResponse, "description": "Bad Request"},
         500: {"model": ErrorResponse, "description": "Internal server error"},
     },
 )
-async def list_servers():
-    return await cs2_service.list_servers()
+async def list_servers(
+    if_none_match: Optional[str] = Header(None),
+    server_status: Optional[str] = Query(None, alias="status", description="online / offline"),
+    owner: Optional[str] = Query(None),
+    static: Optional[bool] = Query(None),
+    map_id: Optional[int] = Query(None),
+    min_players: Optional[int] = Query(None, ge=0),
+    sort: Optional[str] = Query(
+        None,
+        description="name, owner, status, map_id, players_current; prefix with - for descending",
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+):
+    """
+     - #### Without query params returns the whole fleet ####
+     - #### With pagination the next page cursor is returned in the X-Next-Cursor header, the number of matched servers in X-Total-Count ####
+    """
+
+    return await cs2_service.list_servers(
+        if_none_match=if_none_match,
+        status=server_status,
+        owner=owner,
+        static=static,
+        map_id=map_id,
+        min_players=min_players,
+        sort=sort,
+        cursor=cursor,
+        limit=limit,
+    )
 
 
 @router.get("/servers/my-servers")
@@ -32,15 +62,169 @@ async def list_servers_by_owner(
     return await cs2_service.list_server_by_owner(owner=current_user.username)
 
 
+@router.get("/servers/stream", summary="Server status stream (SSE / WebSocket) 🌐")
+async def stream_servers(
+    mine: bool = Query(False, description="Only servers of the current user"),
+    current_user: Optional[UserPayload] = Depends(auth_service.get_current_user_optional),
+):
+    """
+    ## Server-Sent Events / WebSocket endpoint. ##
+     - #### **Protocol**: SSE (GET) or WS ####
+     - #### **Path**: /api/cs2/servers/stream ####
+     - #### **Description**: First message is a `snapshot` with all servers, then only `delta` messages with per-server changes. After a buffer overflow a new `snapshot` is sent. ####
+     - #### **Required for mine=true**: /api/auth/login ####
+    """
+
+    owner = None
+    if mine:
+        if not current_user:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Not authenticated")
+            )
+            raise HTTPException(status_code=401, detail=error_response)
+        owner = current_user.username
+
+    return await cs2_service.stream_servers(owner=owner)
+
+
+@router.websocket("/servers/stream")
+async def stream_servers_ws(websocket: WebSocket, mine: bool = Query(False)):
+    owner = None
+    if mine:
+        current_user = auth_service.get_current_user_optional(websocket)
+        if not current_user:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        owner = current_user.username
+
+    return await cs2_service.stream_servers_ws(websocket, owner=owner)
+
+
+@router.websocket("/servers/{server_name}/logs")
+async def stream_server_logs(
+    websocket: WebSocket,
+    server_name: str,
+    tail: int = Query(100, ge=0, le=500),
+    grep: Optional[str] = Query(None, max_length=200),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - #### Messages: `{"type": "lines", "lines": [...], "dropped": n}`; dropped is the number of lines skipped because the client was too slow ####
+    """
+
+    current_user = auth_service.get_current_user_optional(websocket)
+    if not current_user or current_user.role != "admin":
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    return await cs2_service.stream_logs_ws(websocket, server_name, tail=tail, grep=grep)
+
+
+@router.get(
+    "/servers/{server_name}/files",
+    response_model=FileListResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+    },
+)
+async def list_server_files(
+    server_name: str,
+    path: str = Query("", description="Путь относительно тома CS2"),
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+    """
+
+    return await cs2_service.list_files(server_name, path)
+
+
+@router.get(
+    "/servers/{server_name}/files/download",
+    responses={
+        200: {"content": {"application/octet-stream": {}}},
+        206: {"description": "Partial Content"},
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        416: {"description": "Range Not Satisfiable"},
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+    },
+)
+async def download_server_file(
+    server_name: str,
+    path: str = Query(..., description="Путь к файлу относительно тома CS2"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - #### Supports a single `Range: bytes=start-end` for resumable downloads of GOTV demos ####
+    """
+
+    return await cs2_service.download_file(server_name, path, range_header=range_header)
+
+
+@router.get(
+    "/servers/{server_name}/players",
+    response_model=ServerPlayersResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        409: {"model": ErrorResponse, "description": "Conflict"},
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+    },
+)
+async def list_server_players(server_name: str):
+    return await cs2_service.list_server_players(server_name)
+
+
+@router.get(
+    "/servers/{server_name}/rules",
+    response_model=ServerRulesResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        409: {"model": ErrorResponse, "description": "Conflict"},
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+    },
+)
+async def list_server_rules(server_name: str):
+    return await cs2_service.list_server_rules(server_name)
+
+
+@router.get(
+    "/servers/{server_name}/history",
+    response_model=ServerHistoryResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+    },
+)
+async def server_history(
+    server_name: str,
+    start: Optional[datetime] = Query(None, description="По умолчанию end - 1 час"),
+    end: Optional[datetime] = Query(None, description="По умолчанию сейчас"),
+    resolution: Optional[str] = Query(
+        None, pattern="^(1m|1h)$", description="1m / 1h, по умолчанию по длине диапазона"
+    ),
+):
+    return await cs2_service.server_history(
+        server_name, start=start, end=end, resolution=resolution
+    )
+
+
 @router.get(
     "/maps",
     response_model=List[MapItem],
     responses={
+        304: {"description": "Not Modified"},
         500: {"model": ErrorResponse, "description": "Internal server error"},
     },
 )
-async def list_maps():
-    return await cs2_service.list_maps()
+async def list_maps(
+    response: Response, if_none_match: Optional[str] = Header(None)
+):
+    return await cs2_service.list_maps(response, if_none_match=if_none_match)
 
 
 @router.post(
@@ -58,12 +242,16 @@ async def list_maps():
 async def create_server(
     request: CreateServerRequest,
     owner: UserPayload = Depends(auth_service.get_current_user),
+    idempotency_key: Optional[str] = Header(None),
 ):
     """
      - #### **Required**: /api/auth/login ####
+     - #### A retry with the same Idempotency-Key returns the stored result (Idempotent-Replayed: true) ####
     """
 
-    return await cs2_service.create_server(request=request, owner=owner)
+    return await cs2_service.create_server(
+        request=request, owner=owner, idempotency_key=idempotency_key
+    )
 
 
 @router.delete(
@@ -76,6 +264,7 @@ async def create_server(
 async def delete_server(
     request: DeleteServerRequest,
     current_user: UserPayload = Depends(auth_service.get_current_user),
+    idempotency_key: Optional[str] = Header(None),
 ):
     """
      - #### **Required**: /api/auth/login ####
@@ -88,8 +277,8 @@ async def delete_server(
             )
             raise HTTPException(status_code=403, detail=error_response)
 
-        return await cs2_service._delete_server_container(
-            server_name=request.server_name
+        return await cs2_service.delete_server(
+            server_name=request.server_name, idempotency_key=idempotency_key
         )
 
 
@@ -102,8 +291,10 @@ async def delete_server(
         500: {"model": ErrorResponse, "description": "Internal server error"},
     },
 )
-async def start_server(request: ServerRequest):
-    return await cs2_service.start_server(request)
+async def start_server(
+    request: ServerRequest, idempotency_key: Optional[str] = Header(None)
+):
+    return await cs2_service.start_server(request, idempotency_key=idempotency_key)
 
 
 @router.post(
@@ -116,8 +307,10 @@ async def start_server(request: ServerRequest):
         500: {"model": ErrorResponse, "description": "Internal server Error"},
     },
 )
-async def stop_server(request: ServerRequest):
-    return await cs2_service.stop_server(request)
+async def stop_server(
+    request: ServerRequest, idempotency_key: Optional[str] = Header(None)
+):
+    return await cs2_service.stop_server(request, idempotency_key=idempotency_key)
 
 
 @router.post(
@@ -130,3 +323,51 @@ async def stop_server(request: ServerRequest):
 )
 async def execute_commands(request: ServerSettingsRequest):
     return await cs2_service.execute_commands(request)
+
+
+_BULK_RESPONSES = {
+    200: {
+        "content": {"application/x-ndjson": {}},
+        "description": "BulkServerResult per server, then {\"summary\": BulkServerSummary}",
+    },
+    422: {"model": ErrorResponse, "description": "Validation Error"},
+    500: {"model": ErrorResponse, "description": "Internal server error"},
+}
+
+
+@router.post("/bulk/server-start", responses=_BULK_RESPONSES)
+async def bulk_start_servers(
+    request: BulkServerRequest,
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - #### Servers are selected by server_names or by owner/static; the response streams one NDJSON line per server ####
+    """
+
+    return await cs2_service.bulk_lifecycle("start", request)
+
+
+@router.post("/bulk/server-stop", responses=_BULK_RESPONSES)
+async def bulk_stop_servers(
+    request: BulkServerRequest,
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - #### Servers with players are skipped with 409, like /server-stop ####
+    """
+
+    return await cs2_service.bulk_lifecycle("stop", request)
+
+
+@router.delete("/bulk/delete-server", responses=_BULK_RESPONSES)
+async def bulk_delete_servers(
+    request: BulkServerRequest,
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+    """
+
+    return await cs2_service.bulk_lifecycle("delete", request)
@@ -0,0 +1,194 @@
+from fastapi import APIRouter, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from core.http_client import http_clients
+from services.server_registry import server_registry
+from services.provisioning import provisioner
+from services.warm_pool import warm_pool
+from services.operation_lock import server_operations
+from services.artifact_service import Artifact, artifact_cache
+from services.node_service import nodes
+from services.telemetry_service import telemetry_reader
+from services.port_service import PortManager
+from services.auth_service import AuthService
+from core.config import get_settings
+from models.models import *
+
+router = APIRouter()
+settings = get_settings()
+auth_service = AuthService()
+docker_port = PortManager()
+
+
+@router.get("/metrics/http")
+async def http_metrics(
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+    """
+
+    return http_clients.metrics()
+
+
+@router.get("/metrics/scans")
+async def scan_metrics(
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+    """
+
+    return server_registry.scans.metrics.as_dict()
+
+
+@router.get("/metrics/provisioning")
+async def provisioning_metrics(
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+    """
+
+    return {
+        "create": provisioner.metrics(),
+        "warm_pool": warm_pool.metrics(),
+        "operations": server_operations.metrics(),
+    }
+
+
+@router.get("/metrics/nodes")
+async def node_metrics(
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - Последняя сводка docker stats по хостам и контейнерам
+    """
+
+    names = {node.id: node.name for node in nodes.all()}
+    return [
+        {
+            "node_id": host.node_id,
+            "node": names.get(host.node_id),
+            "cpu_used": host.cpu_used,
+            "mem_used": host.mem_used,
+            "age_seconds": round(host.age, 1),
+            "stale": host.age > settings.telemetry_stale_after,
+            "containers": host.containers,
+        }
+        for host in telemetry_reader.hosts().values()
+    ]
+
+
+@router.get("/nodes", response_model=List[NodeItem])
+async def list_nodes(
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+    """
+
+    capacity = nodes.capacity()
+    items = []
+    for node in nodes.all():
+        load = await nodes.load(node) if node.enabled else None
+        free_ports, servers = capacity.get(node.id, (0, 0))
+        items.append(
+            NodeItem(
+                id=node.id,
+                name=node.name,
+                ssh_host=node.ssh_host,
+                ssh_port=node.ssh_port,
+                public_ip=node.public_ip,
+                port_min=node.port_min,
+                port_max=node.port_max,
+                max_servers=node.max_servers,
+                enabled=node.enabled,
+                free_ports=free_ports,
+                servers=servers,
+                cpu_headroom=load.cpu_headroom if load else None,
+                mem_headroom=load.mem_headroom if load else None,
+            )
+        )
+    return items
+
+
+@router.post(
+    "/nodes",
+    response_model=NodeItem,
+    responses={400: {"model": ErrorResponse, "description": "Bad Request"}},
+)
+async def register_node(
+    request: NodeRequest,
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - Регистрирует или обновляет хост; диапазон портов добавляется в ports
+    """
+
+    if (request.port_min is None) != (request.port_max is None) or (
+        request.port_min is not None and request.port_min > request.port_max
+    ):
+        error_response = jsonable_encoder(
+            ErrorResponse(status="failed", msg="Invalid port range")
+        )
+        return JSONResponse(status_code=400, content=error_response)
+
+    node = nodes.register(**request.model_dump())
+    if node.port_min is not None:
+        docker_port.seed_range(node.id, node.port_min, node.port_max)
+
+    free_ports, servers = nodes.capacity().get(node.id, (0, 0))
+    return NodeItem(
+        id=node.id,
+        name=node.name,
+        ssh_host=node.ssh_host,
+        ssh_port=node.ssh_port,
+        public_ip=node.public_ip,
+        port_min=node.port_min,
+        port_max=node.port_max,
+        max_servers=node.max_servers,
+        enabled=node.enabled,
+        free_ports=free_ports,
+        servers=servers,
+    )
+
+
+@router.get("/artifacts", response_model=List[ArtifactItem])
+async def list_artifacts(
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - nodes: хосты, на которых артефакт уже лежит в кэше
+    """
+
+    return [ArtifactItem(**item) for item in artifact_cache.listing()]
+
+
+@router.post(
+    "/artifacts",
+    response_model=ArtifactItem,
+    responses={400: {"model": ErrorResponse, "description": "Bad Request"}},
+)
+async def register_artifact(
+    request: ArtifactRequest,
+    current_user: UserPayload = Depends(auth_service.get_current_admin),
+):
+    """
+     - #### **Required**: /api/auth/login (admin) ####
+     - Регистрирует карту, workshop-предмет или бандл конфигов; хосты скачают его при следующей синхронизации
+    """
+
+    data = request.model_dump(exclude={"map_id"})
+    try:
+        artifact = artifact_cache.register(Artifact(**data), map_id=request.map_id)
+    except LookupError as e:
+        error_response = jsonable_encoder(ErrorResponse(status="failed", msg=str(e)))
+        return JSONResponse(status_code=400, content=error_response)
+
+    server_registry.invalidate_maps()
+    return ArtifactItem(**artifact.__dict__)
@@ -0,0 +1,81 @@
+"""Сравнение стоимости сериализации списка серверов на один запрос.
+
+Запуск из каталога app:
+    python -m benchmarks.bench_serialization --servers 300 --requests 2000
+"""
+
+from fastapi.encoders import jsonable_encoder
+
+from models.models import ServerOnline, ServerOffline, ServerResponse
+
+import argparse
+import json
+import time
+import orjson
+
+
+def build_statuses(count: int):
+    statuses = []
+    for index in range(count):
+        if index % 3:
+            statuses.append(
+                ServerOnline(
+                    owner=f"user{index % 50}",
+                    server_name=f"server-{index}",
+                    ip="linfed.ru",
+                    port=27000 + index,
+                    map_id=index % 12,
+                    players_current=index % 10,
+                    players_max=10,
+                    container_state="running",
+                )
+            )
+        else:
+            statuses.append(
+                ServerOffline(
+                    owner=f"user{index % 50}",
+                    server_name=f"server-{index}",
+                    container_state="exited",
+                )
+            )
+    return statuses
+
+
+def model_path(statuses):
+    # То, что делал FastAPI для response_model=ServerResponse
+    validated = ServerResponse.model_validate(
+        [status.model_dump() for status in statuses]
+    )
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def orjson_path(statuses):
+    return orjson.dumps([status.model_dump() for status in statuses])
+
+
+def measure(label, func, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed / requests * 1e6:10.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servers", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    statuses = build_statuses(args.servers)
+    cached_body = orjson_path(statuses)
+
+    print(f"{args.servers} servers, {len(cached_body)} bytes body")
+    measure("pydantic + jsonable_encoder", lambda: model_path(statuses), args.requests)
+    measure("orjson per request", lambda: orjson_path(statuses), args.requests)
+    # Тело готово заранее, на запрос приходится только отдача байтов
+    measure("pre-serialized (cache hit)", lambda: cached_body, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Память кэша статусов на флоте из N серверов.
+
+Сравниваются строки-словари, pydantic-модели и слотовые записи StatusStore.
+
+Запуск из каталога app:
+    python -m benchmarks.bench_status_memory --servers 10000
+"""
+
+from models.models import ServerOnline, ServerOffline
+from services.status_store import ServerStatusRecord
+
+import argparse
+import gc
+import tracemalloc
+
+
+def raw_fields(count: int):
+    # Строки собираются заново, как после чтения из БД или JSONB
+    for index in range(count):
+        online = bool(index % 3)
+        yield {
+            "status": "online" if online else "offline",
+            "owner": "".join(["user", str(index % 50)]),
+            "static": index % 7 == 0,
+            "server_name": f"server-{index}",
+            "ip": "".join(["linfed", ".ru"]) if online else None,
+            "port": 27000 + index if online else None,
+            "map_id": index % 12 if online else None,
+            "players_current": index % 10 if online else None,
+            "players_max": 10 if online else None,
+            "container_state": "".join(["run", "ning"]) if online else "".join(["exi", "ted"]),
+        }
+
+
+def build_dicts(count: int):
+    return [dict(data) for data in raw_fields(count)]
+
+
+def build_models(count: int):
+    statuses = []
+    for data in raw_fields(count):
+        if data["status"] == "online":
+            statuses.append(ServerOnline(**data))
+        else:
+            statuses.append(
+                ServerOffline(
+                    status="offline",
+                    owner=data["owner"],
+                    static=data["static"],
+                    server_name=data["server_name"],
+                    container_state=data["container_state"],
+                )
+            )
+    return statuses
+
+
+def build_records(count: int):
+    return [ServerStatusRecord.from_dict(data) for data in raw_fields(count)]
+
+
+def measure(label, build, count):
+    gc.collect()
+    tracemalloc.start()
+    statuses = build(count)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {size / 1024 / 1024:8.2f} MiB {size / count:8.0f} B/server")
+    del statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servers", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{args.servers} servers")
+    measure("dict rows", build_dicts, args.servers)
+    measure("pydantic models", build_models, args.servers)
+    measure("slotted records", build_records, args.servers)
+
+
+if __name__ == "__main__":
+    main()
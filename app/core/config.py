@@ -21,6 +21,23 @@ class Settings(BaseSettings):
     ssh_host: str = os.getenv("SSH_HOST", "")
     ssh_user: str = os.getenv("SSH_USER", "")
     ssh_key: Optional[str] = os.getenv("SSH_KEY", "")
+    ssh_keepalive_interval: int = os.getenv("SSH_KEEPALIVE_INTERVAL", 30)
+    container_state_ttl: float = os.getenv("CONTAINER_STATE_TTL", 3)
+
+    #Docker nodes (SSH_HOST/SSH_USER describe the default node)
+    default_node_name: str = os.getenv("DEFAULT_NODE_NAME", "default")
+    default_node_ip: str = os.getenv("DEFAULT_NODE_IP", "linfed.ru")
+    default_node_ssh_port: int = os.getenv("DEFAULT_NODE_SSH_PORT", 22)
+    node_cache_ttl: float = os.getenv("NODE_CACHE_TTL", 30)
+    node_load_ttl: float = os.getenv("NODE_LOAD_TTL", 10)
+
+    #Node telemetry and create-server admission
+    telemetry_flush_interval: float = os.getenv("TELEMETRY_FLUSH_INTERVAL", 5)
+    telemetry_stale_after: float = os.getenv("TELEMETRY_STALE_AFTER", 30)
+    telemetry_cache_ttl: float = os.getenv("TELEMETRY_CACHE_TTL", 2)
+    admission_max_cpu: float = os.getenv("ADMISSION_MAX_CPU", 0.85)
+    admission_max_mem: float = os.getenv("ADMISSION_MAX_MEM", 0.9)
+    admission_retry_after: int = os.getenv("ADMISSION_RETRY_AFTER", 30)
 
     #DB Settings Connection
     db_name: str = os.getenv("DB_NAME", "")
@@ -58,6 +75,93 @@ class Settings(BaseSettings):
     #Monitoring server activity
     max_empty_minute: int = os.getenv("MAX_EMPTY_MINUTE", "")
 
+    #Server registry
+    status_cache_ttl: float = os.getenv("STATUS_CACHE_TTL", 15)
+    status_poll_interval: float = os.getenv("STATUS_POLL_INTERVAL", 5)
+    scan_reuse_window: float = os.getenv("SCAN_REUSE_WINDOW", 1)
+    a2s_timeout: float = os.getenv("A2S_TIMEOUT", 3)
+    a2s_details_ttl: float = os.getenv("A2S_DETAILS_TTL", 5)
+
+    #Status stream (SSE/WebSocket)
+    status_stream_buffer: int = os.getenv("STATUS_STREAM_BUFFER", 100)
+    status_stream_keepalive: float = os.getenv("STATUS_STREAM_KEEPALIVE", 15)
+
+    #Warm start
+    status_checkpoint_interval: float = os.getenv("STATUS_CHECKPOINT_INTERVAL", 60)
+    status_warm_start_grace: float = os.getenv("STATUS_WARM_START_GRACE", 60)
+
+    #Docker events (container state pushed from the docker daemon)
+    docker_events_cursor_interval: float = os.getenv("DOCKER_EVENTS_CURSOR_INTERVAL", 5)
+    readiness_probe_interval: float = os.getenv("READINESS_PROBE_INTERVAL", 2)
+    readiness_fallback_interval: float = os.getenv("READINESS_FALLBACK_INTERVAL", 10)
+    server_start_timeout: float = os.getenv("SERVER_START_TIMEOUT", 60)
+    server_stop_timeout: float = os.getenv("SERVER_STOP_TIMEOUT", 60)
+
+    #Bulk start/stop/delete
+    bulk_concurrency: int = os.getenv("BULK_CONCURRENCY", 8)
+
+    #Per-server operation locks and Idempotency-Key
+    server_lock_namespace: int = os.getenv("SERVER_LOCK_NAMESPACE", 727002)
+    server_lock_timeout: float = os.getenv("SERVER_LOCK_TIMEOUT", 90)
+    idempotency_key_ttl: int = os.getenv("IDEMPOTENCY_KEY_TTL", 86400)
+
+    #Server settings over RCON
+    rcon_batch_window: float = os.getenv("RCON_BATCH_WINDOW", 0.05)
+    rcon_timeout: float = os.getenv("RCON_TIMEOUT", 5)
+    settings_confirm_timeout: float = os.getenv("SETTINGS_CONFIRM_TIMEOUT", 30)
+
+    #Artifact cache on docker hosts (maps, workshop items, config bundles)
+    cs2_volume_root: str = os.getenv("CS2_VOLUME_ROOT", "/home/cs/cs2-docker")
+    cs2_config_url: str = os.getenv("CS2_CONFIG_URL", "https://file.linfed.ru/cs2.zip")
+    artifact_root: str = os.getenv("ARTIFACT_ROOT", "/home/cs/artifacts")
+    artifact_sync_interval: float = os.getenv("ARTIFACT_SYNC_INTERVAL", 300)
+
+    #Container log stream (WebSocket)
+    log_stream_history: int = os.getenv("LOG_STREAM_HISTORY", 500)
+    log_stream_buffer: int = os.getenv("LOG_STREAM_BUFFER", 2000)
+    log_stream_retry_interval: float = os.getenv("LOG_STREAM_RETRY_INTERVAL", 3)
+    log_batch_window: float = os.getenv("LOG_BATCH_WINDOW", 0.1)
+    log_batch_max: int = os.getenv("LOG_BATCH_MAX", 500)
+
+    #Server files over SFTP
+    sftp_chunk_size: int = os.getenv("SFTP_CHUNK_SIZE", 262144)
+
+    #Adaptive A2S polling
+    probe_max_interval: float = os.getenv("PROBE_MAX_INTERVAL", 60)
+    probe_backoff_factor: float = os.getenv("PROBE_BACKOFF_FACTOR", 2)
+    probe_max_per_second: float = os.getenv("PROBE_MAX_PER_SECOND", 50)
+    maps_cache_ttl: float = os.getenv("MAPS_CACHE_TTL", 60)
+    servers_max_age: int = os.getenv("SERVERS_MAX_AGE", 2)
+    maps_max_age: int = os.getenv("MAPS_MAX_AGE", 300)
+
+    #Leader election between workers
+    leader_lock_key: int = os.getenv("LEADER_LOCK_KEY", 727001)
+    leader_retry_interval: float = os.getenv("LEADER_RETRY_INTERVAL", 5)
+    leader_heartbeat_interval: float = os.getenv("LEADER_HEARTBEAT_INTERVAL", 5)
+
+    #HTTP client sessions
+    http_keepalive_timeout: float = os.getenv("HTTP_KEEPALIVE_TIMEOUT", 30)
+    http_dns_cache_ttl: int = os.getenv("HTTP_DNS_CACHE_TTL", 300)
+    http_steam_limit: int = os.getenv("HTTP_STEAM_LIMIT", 10)
+    http_steam_timeout: float = os.getenv("HTTP_STEAM_TIMEOUT", 15)
+
+    #Warm pool of pre-booted containers (max 0 = disabled)
+    warm_pool_min: int = os.getenv("WARM_POOL_MIN", 0)
+    warm_pool_max: int = os.getenv("WARM_POOL_MAX", 0)
+    warm_pool_refill_interval: float = os.getenv("WARM_POOL_REFILL_INTERVAL", 15)
+    warm_pool_boot_timeout: float = os.getenv("WARM_POOL_BOOT_TIMEOUT", 180)
+    warm_pool_claim_timeout: float = os.getenv("WARM_POOL_CLAIM_TIMEOUT", 120)
+    server_password_key: str = os.getenv("SERVER_PASSWORD_KEY", "")
+    warm_pool_demand_days: int = os.getenv("WARM_POOL_DEMAND_DAYS", 14)
+
+    #Player history
+    history_sample_interval: float = os.getenv("HISTORY_SAMPLE_INTERVAL", 30)
+    history_flush_interval: float = os.getenv("HISTORY_FLUSH_INTERVAL", 10)
+    history_buffer_size: int = os.getenv("HISTORY_BUFFER_SIZE", 200000)
+    history_rollup_interval: float = os.getenv("HISTORY_ROLLUP_INTERVAL", 60)
+    history_raw_retention_days: int = os.getenv("HISTORY_RAW_RETENTION_DAYS", 7)
+    history_minute_retention_days: int = os.getenv("HISTORY_MINUTE_RETENTION_DAYS", 30)
+
     class Config:
         env_file = ".env"
 
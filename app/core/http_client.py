@@ -0,0 +1,158 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from core.config import get_settings
+
+import aiohttp
+
+
+settings = get_settings()
+
+
+@dataclass
+class SessionConfig:
+    limit: int
+    limit_per_host: int
+    keepalive_timeout: float
+    ttl_dns_cache: int
+    total_timeout: float
+    connect_timeout: float
+
+
+@dataclass
+class SessionMetrics:
+    requests: int = 0
+    active_requests: int = 0
+    failed_requests: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    connections_queued: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+@dataclass
+class _NamedSession:
+    config: SessionConfig
+    metrics: SessionMetrics = field(default_factory=SessionMetrics)
+    session: Optional[aiohttp.ClientSession] = None
+
+
+class HttpClientRegistry:
+    """Именованные aiohttp-сессии с общим пулом соединений на всё приложение.
+
+    Сессии создаются в lifespan и живут до остановки воркера, поэтому
+    TCP/TLS-соединения и DNS-ответы переиспользуются между запросами.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, _NamedSession] = {}
+
+    def register(self, name: str, config: SessionConfig):
+        self._sessions[name] = _NamedSession(config=config)
+
+    async def start(self):
+        for name, named in self._sessions.items():
+            if named.session is None or named.session.closed:
+                named.session = self._create_session(named)
+        print("HTTP client sessions started")
+
+    async def close(self):
+        for named in self._sessions.values():
+            if named.session is not None and not named.session.closed:
+                await named.session.close()
+            named.session = None
+        print("HTTP client sessions closed")
+
+    def get(self, name: str) -> aiohttp.ClientSession:
+        named = self._sessions[name]
+        # Вне lifespan (скрипты, отладка) сессия создаётся лениво
+        if named.session is None or named.session.closed:
+            named.session = self._create_session(named)
+        return named.session
+
+    def metrics(self):
+        return {
+            name: {
+                **named.metrics.as_dict(),
+                "limit": named.config.limit,
+                "limit_per_host": named.config.limit_per_host,
+                "open": named.session is not None and not named.session.closed,
+            }
+            for name, named in self._sessions.items()
+        }
+
+    def _create_session(self, named: _NamedSession) -> aiohttp.ClientSession:
+        config = named.config
+        connector = aiohttp.TCPConnector(
+            limit=config.limit,
+            limit_per_host=config.limit_per_host,
+            keepalive_timeout=config.keepalive_timeout,
+            ttl_dns_cache=config.ttl_dns_cache,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=config.total_timeout, connect=config.connect_timeout
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            trace_configs=[self._trace_config(named.metrics)],
+        )
+
+    @staticmethod
+    def _trace_config(metrics: SessionMetrics) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            metrics.requests += 1
+            metrics.active_requests += 1
+
+        async def on_request_end(session, ctx, params):
+            metrics.active_requests -= 1
+
+        async def on_request_exception(session, ctx, params):
+            metrics.active_requests -= 1
+            metrics.failed_requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            metrics.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            metrics.connections_reused += 1
+
+        async def on_connection_queued_start(session, ctx, params):
+            metrics.connections_queued += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            metrics.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            metrics.dns_cache_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+
+http_clients = HttpClientRegistry()
+
+http_clients.register(
+    "steam",
+    SessionConfig(
+        limit=settings.http_steam_limit,
+        limit_per_host=settings.http_steam_limit,
+        keepalive_timeout=settings.http_keepalive_timeout,
+        ttl_dns_cache=settings.http_dns_cache_ttl,
+        total_timeout=settings.http_steam_timeout,
+        connect_timeout=5,
+    ),
+)
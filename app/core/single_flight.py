@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import asyncio
+import time
+
+
+@dataclass
+class SingleFlightMetrics:
+    calls: int = 0
+    executions: int = 0
+    coalesced: int = 0
+    reused: int = 0
+
+    def as_dict(self):
+        return {
+            **self.__dict__,
+            "coalescing_ratio": 1 - self.executions / self.calls if self.calls else 0.0,
+        }
+
+
+class SingleFlight:
+    """Склейка одинаковых конкурентных вызовов в одно выполнение.
+
+    Пока вызов с ключом key выполняется, остальные вызывающие ждут его
+    результат. Сама операция идёт в отдельной задаче, поэтому отмена одного
+    из ожидающих (клиент закрыл соединение) не прерывает её для остальных.
+    """
+
+    def __init__(self):
+        self.metrics = SingleFlightMetrics()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self._max_reuse = 0.0
+        self._pruned_at = time.monotonic()
+
+    async def do(
+        self,
+        key: Hashable,
+        func: Callable[[], Awaitable[Any]],
+        reuse_for: float = 0.0,
+    ):
+        self.metrics.calls += 1
+
+        if reuse_for > 0:
+            cached = self._results.get(key)
+            if cached is not None and time.monotonic() - cached[0] <= reuse_for:
+                self.metrics.reused += 1
+                return cached[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.metrics.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.metrics.executions += 1
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done, reuse_for))
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable):
+        self._results.pop(key, None)
+
+    def _finish(self, key: Hashable, task: asyncio.Task, reuse_for: float):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+        # Результат нужен только тем, кто готов его переиспользовать
+        if reuse_for <= 0 or task.cancelled() or task.exception() is not None:
+            return
+
+        now = time.monotonic()
+        self._results[key] = (now, task.result())
+        self._max_reuse = max(self._max_reuse, reuse_for)
+
+        # Ключи по владельцам и серверам не повторяются бесконечно: старые выкидываются
+        if now - self._pruned_at > self._max_reuse:
+            self._results = {
+                cached_key: cached
+                for cached_key, cached in self._results.items()
+                if now - cached[0] <= self._max_reuse
+            }
+            self._pruned_at = now
@@ -10,16 +10,20 @@ settings = get_settings()
 pool = None
 
 
+def get_conninfo():
+    return f"""
+        dbname={settings.db_name}
+        user={settings.db_user}
+        password={settings.db_pass}
+        host={settings.db_host}
+        port={settings.db_port}
+    """
+
+
 def init_pool():
     global pool
     pool = ConnectionPool(
-        conninfo=f"""
-            dbname={settings.db_name}
-            user={settings.db_user}
-            password={settings.db_pass}
-            host={settings.db_host}
-            port={settings.db_port}
-        """,
+        conninfo=get_conninfo(),
         min_size=1,
         max_size=10,
     )
@@ -41,6 +45,8 @@ def init_pool():
                 )
             """
             )
+            cur.execute("CREATE INDEX IF NOT EXISTS servers_name_idx ON servers(name)")
+            cur.execute("CREATE INDEX IF NOT EXISTS servers_owner_idx ON servers(owner)")
             cur.execute(
                 """
                 CREATE TABLE IF NOT EXISTS maps(
@@ -77,6 +83,195 @@ def init_pool():
                 )
 """
             )
+            # Снимок статусов серверов от лидера, общий для всех воркеров
+            cur.execute(
+                """
+                CREATE UNLOGGED TABLE IF NOT EXISTS server_status(
+                    name TEXT PRIMARY KEY,
+                    data JSONB NOT NULL,
+                    version BIGINT NOT NULL,
+                    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            # Чекпоинт снимка для тёплого старта: обычная таблица, переживает рестарт Postgres
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS server_status_checkpoint(
+                    id SMALLINT PRIMARY KEY DEFAULT 1,
+                    data JSONB NOT NULL,
+                    saved_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            # Тёплый пул заранее запущенных контейнеров и журнал спроса на создание
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS warm_pool(
+                    name TEXT PRIMARY KEY,
+                    port INTEGER NOT NULL,
+                    server_steamid BIGINT,
+                    srcd_token CHAR(32),
+                    state VARCHAR DEFAULT 'booting',
+                    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            cur.execute("ALTER TABLE warm_pool ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ")
+            # Пароль сервера из пула (Fernet): в окружении контейнера остаётся случайный пароль пула
+            cur.execute("ALTER TABLE servers DROP COLUMN IF EXISTS password")
+            cur.execute("ALTER TABLE servers ADD COLUMN IF NOT EXISTS password_enc TEXT")
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS server_creations(
+                    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                    pooled BOOLEAN NOT NULL
+                )
+            """
+            )
+            # История онлайна: сырые сэмплы по дням и агрегаты за минуту/час
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS server_samples(
+                    server_name TEXT NOT NULL,
+                    ts TIMESTAMPTZ NOT NULL,
+                    players INTEGER NOT NULL,
+                    map_id INTEGER,
+                    online BOOLEAN NOT NULL
+                ) PARTITION BY RANGE (ts)
+            """
+            )
+            for table in ("server_samples_1m", "server_samples_1h"):
+                cur.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {table}(
+                        server_name TEXT NOT NULL,
+                        bucket TIMESTAMPTZ NOT NULL,
+                        samples INTEGER NOT NULL,
+                        online_samples INTEGER NOT NULL,
+                        avg_players REAL NOT NULL,
+                        max_players INTEGER NOT NULL,
+                        PRIMARY KEY (server_name, bucket)
+                    )
+                """
+                )
+            # Docker-хосты; серверы, порты и пул привязаны к хосту
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS nodes(
+                    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    name TEXT UNIQUE NOT NULL,
+                    ssh_host TEXT NOT NULL,
+                    ssh_port INTEGER DEFAULT 22,
+                    ssh_user TEXT NOT NULL,
+                    public_ip TEXT NOT NULL,
+                    port_min INTEGER,
+                    port_max INTEGER,
+                    max_servers INTEGER,
+                    enabled BOOLEAN DEFAULT TRUE,
+                    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            for table in ("servers", "ports", "warm_pool"):
+                cur.execute(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS node_id INTEGER REFERENCES nodes(id)"
+                )
+            cur.execute("CREATE INDEX IF NOT EXISTS ports_node_idx ON ports(node_id, is_occupied)")
+            # Последняя сводка docker stats по хостам от лидера
+            cur.execute(
+                """
+                CREATE UNLOGGED TABLE IF NOT EXISTS node_metrics(
+                    node_id INTEGER PRIMARY KEY REFERENCES nodes(id),
+                    cpu_used REAL NOT NULL,
+                    mem_used REAL NOT NULL,
+                    containers JSONB NOT NULL,
+                    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            # Позиция потока docker events по хостам для --since после обрыва
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS docker_event_cursors(
+                    node_id INTEGER PRIMARY KEY REFERENCES nodes(id),
+                    since_nano BIGINT NOT NULL,
+                    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+
+            # Сохранённые ответы start/stop/create/delete по Idempotency-Key
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS idempotency_keys(
+                    key TEXT PRIMARY KEY,
+                    operation TEXT NOT NULL,
+                    server_name TEXT NOT NULL,
+                    request_hash TEXT NOT NULL,
+                    status_code INTEGER NOT NULL,
+                    response JSONB NOT NULL,
+                    headers JSONB,
+                    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+
+            # Кэш артефактов по sha256 и что из него уже лежит на хостах
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS artifacts(
+                    sha256 TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    size BIGINT,
+                    workshop_id BIGINT,
+                    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS node_artifacts(
+                    node_id INTEGER REFERENCES nodes(id),
+                    sha256 TEXT REFERENCES artifacts(sha256) ON DELETE CASCADE,
+                    synced_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (node_id, sha256)
+                )
+            """
+            )
+            cur.execute(
+                "ALTER TABLE maps ADD COLUMN IF NOT EXISTS artifact_sha256 TEXT REFERENCES artifacts(sha256)"
+            )
+            cur.execute("ALTER TABLE maps ADD COLUMN IF NOT EXISTS workshop_id BIGINT")
+
+            # Хост из настроек SSH_* остаётся хостом по умолчанию
+            cur.execute(
+                """
+                INSERT INTO nodes (name, ssh_host, ssh_port, ssh_user, public_ip)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (name) DO UPDATE SET
+                    ssh_host = EXCLUDED.ssh_host,
+                    ssh_port = EXCLUDED.ssh_port,
+                    ssh_user = EXCLUDED.ssh_user,
+                    public_ip = EXCLUDED.public_ip
+                RETURNING id
+                """,
+                (
+                    settings.default_node_name,
+                    settings.ssh_host,
+                    settings.default_node_ssh_port,
+                    settings.ssh_user,
+                    settings.default_node_ip,
+                ),
+            )
+            default_node_id = cur.fetchone()[0]
+            for table in ("servers", "ports", "warm_pool"):
+                cur.execute(
+                    f"UPDATE {table} SET node_id = %s WHERE node_id IS NULL",
+                    (default_node_id,),
+                )
     print("Database pool initialized and tables created")
 
 
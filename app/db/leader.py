@@ -0,0 +1,96 @@
+from typing import Awaitable, Callable, Dict
+
+from core.config import get_settings
+from .database import get_conninfo
+
+import asyncio
+import psycopg
+
+
+settings = get_settings()
+
+
+class LeaderElector:
+    """Выбор лидера среди воркеров через pg_try_advisory_lock.
+
+    Блокировка держится на отдельном соединении: если воркер-лидер умирает,
+    Postgres закрывает его сессию и снимает блокировку, после чего её
+    забирает следующий воркер. Зарегистрированные синглтоны (поллер статусов,
+    чистильщик простаивающих серверов и т.п.) работают только у лидера.
+    """
+
+    def __init__(self, lock_key: int):
+        self.lock_key = lock_key
+        self.is_leader = False
+        self._singletons: Dict[str, Callable[[], Awaitable[None]]] = {}
+        self._task = None
+
+    def singleton(self, name: str):
+        def decorator(func):
+            self._singletons[name] = func
+            return func
+
+        return decorator
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    get_conninfo(), autocommit=True
+                ) as conn:
+                    while not await self._try_acquire(conn):
+                        await asyncio.sleep(settings.leader_retry_interval)
+
+                    await self._lead(conn)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Leader election error: {e}")
+
+            await asyncio.sleep(settings.leader_retry_interval)
+
+    async def _try_acquire(self, conn) -> bool:
+        cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+        row = await cur.fetchone()
+        return bool(row[0])
+
+    async def _lead(self, conn):
+        self.is_leader = True
+        print(f"Worker became leader, starting: {', '.join(self._singletons)}")
+
+        tasks = {name: asyncio.create_task(func()) for name, func in self._singletons.items()}
+        try:
+            while True:
+                await asyncio.sleep(settings.leader_heartbeat_interval)
+
+                # Потеря соединения означает потерю блокировки
+                await conn.execute("SELECT 1")
+
+                for name, task in tasks.items():
+                    if task.done():
+                        if not task.cancelled() and task.exception():
+                            print(f"Singleton {name} failed: {task.exception()}")
+                        tasks[name] = asyncio.create_task(self._singletons[name]())
+        finally:
+            self.is_leader = False
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            print("Worker lost leadership")
+
+
+leader = LeaderElector(lock_key=settings.leader_lock_key)
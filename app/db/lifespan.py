@@ -1,10 +1,26 @@
 from contextlib import asynccontextmanager
 from .database import init_pool, close_pool
+from .leader import leader
+from core.http_client import http_clients
+from services.status_sync import status_listener, status_checkpoint
+from services.node_service import nodes
+# Импорт регистрирует задачу лидера docker_events
+from services.docker_events import docker_events
 
 @asynccontextmanager
 async def lifespan(app):
     try:
         init_pool()
+        # Снимок до приёма трафика: первые /servers не ждут холодного опроса
+        restored = status_checkpoint.load()
+        print(f"Restored {restored} server statuses from checkpoint")
+        await http_clients.start()
+        await status_listener.start()
+        await leader.start()
         yield
     finally:
+        await leader.stop()
+        await status_listener.stop()
+        await nodes.close()
+        await http_clients.close()
         close_pool()
@@ -1,11 +1,13 @@
-from rcon.source import rcon
 from dotenv import load_dotenv
 from typing import Any, Dict
 
 from core.config import get_settings
+from services.server_registry import server_registry
+from services.rcon_batch import rcon_batch, rcon_failed
+from services.artifact_service import artifact_cache
+from services.node_service import nodes
 from models.models import *
 
-import aiohttp
 import asyncssh
 import asyncio
 
@@ -28,24 +30,28 @@ async def handler_map(data: Dict[int, Any]):
         server_name = data["server_name"]
         map_id = data["map_change"]
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{settings.host_url}/api/cs2/maps") as map_response, \
-                    session.get(f"{settings.host_url}/api/cs2/servers") as servers_response:
-                        maps = await map_response.json()
-                        servers = await servers_response.json()
+        maps = server_registry.maps()
+        server = await server_registry.get(server_name)
 
-        map_dict = {item["map_id"]: item["name"] for item in maps}
-        map_name = map_dict.get(map_id)
-
-        server = next((s for s in servers if s.get("server_name") == server_name), None)
+        map_dict = {item["map_id"]: item for item in maps}
+        map_item = map_dict.get(map_id)
 
         if not server:
             return ErrorResponse(status="error", msg="Server not found").model_dump()
 
-        if server.get("map_id") == map_id:
+        if server.map_id == map_id:
             return MapChangeResponse(status="failed", msg="Map already sets")
 
-        await rcon(f"map {map_name}", host=server["ip"], port=server["port"], passwd=settings.rcon_password)
+        if map_item is None:
+            return MapChangeResponse(status="failed", msg="Map not found")
+
+        # Файл карты из кэша может ещё не дойти до хоста этого сервера
+        command = await asyncio.to_thread(
+            lambda: artifact_cache.map_command(map_item, nodes.node_for_server(server_name).id)
+        )
+        reply = await rcon_batch.send(command, host=server.ip, port=server.port)
+        if rcon_failed(reply):
+            return MapChangeResponse(status="failed", msg=f"Map has not been changed: {reply.strip()}")
 
         # async with asyncssh.connect(
         #     settings.ssh_host, username=settings.ssh_user, client_keys=["ssh_key"], known_hosts=None
@@ -56,26 +62,25 @@ async def handler_map(data: Dict[int, Any]):
         #     if result.stderr:
         #         return ErrorResponse(status="error", msg="SSH error").model_dump()
 
-        async with aiohttp.ClientSession() as session:
-            await asyncio.sleep(2)
-            async with session.get(f"{settings.host_url}/api/cs2/servers", timeout=5) as response:
-                servers = await response.json()
-                if server_update := next(
-                    (s for s in servers if s.get("server_name") == server_name), None
-                ):
-                    if server_update["map_id"] != map_id:
-                        return MapChangeResponse(
-                            status="failed", msg="Map has not been changed"
-                        )
-                    return MapChangeResponse(
-                        status="success", msg="Map has been changed"
-                    )
-
-    except aiohttp.ClientError as e:
-        return ErrorResponse(status="error", msg="API request error").model_dump()
+        # Подтверждение по статусу: событие скана или проба A2S после загрузки карты
+        if server_update := await server_registry.wait_for(
+            server_name,
+            lambda status: status.map_id == map_id,
+            timeout=settings.settings_confirm_timeout,
+            probe_interval=settings.readiness_probe_interval,
+        ):
+            if server_update.map_id != map_id:
+                return MapChangeResponse(
+                    status="failed", msg="Map has not been changed"
+                )
+            return MapChangeResponse(
+                status="success", msg="Map has been changed"
+            )
+
     except asyncssh.Error as e:
         return ErrorResponse(status="error", msg="SSH connection error").model_dump()
     except KeyError as e:
         return ErrorResponse(status="error", msg="Missing required field").model_dump()
     except Exception as e:
         return ErrorResponse(status="error", msg="Unexpected error").model_dump()
+
@@ -6,7 +6,7 @@ from db.lifespan import lifespan
 from dotenv import load_dotenv
 
 from core.config import get_settings
-from api.routes import cs2, ts3, auth
+from api.routes import cs2, ts3, auth, system
 from models.models import *
 
 import secrets
@@ -59,6 +59,7 @@ app = FastAPI(
         {"name": "Authentication Handlers", "description": ""},
         {"name": "CS2 Handlers", "description": ""},
         {"name": "TS3 Handlers", "description": ""},
+        {"name": "System Handlers", "description": ""},
     ],
 )
 app.add_middleware(
@@ -67,6 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count", "X-Snapshot-Stale", "Idempotent-Replayed", "Content-Range", "Content-Disposition"],
 )
 
 
@@ -82,6 +84,7 @@ async def get_openapi(username: str = Depends(authenticate)):
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication Handlers"])
 app.include_router(cs2.router, prefix="/api/cs2", tags=["CS2 Handlers"])
 app.include_router(ts3.router, prefix="/api/ts3", tags=["TS3 Handlers"])
+app.include_router(system.router, prefix="/api/system", tags=["System Handlers"])
 
 
 
@@ -1,7 +1,10 @@
 from pydantic import BaseModel, Field, RootModel, EmailStr, field_validator
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
+from datetime import datetime
 from enum import Enum
 
+import asyncio
+
 
 # Error class
 class ErrorResponse(BaseModel):
@@ -19,6 +22,7 @@ class ServerOnline(BaseModel):
     map_id: int
     players_current: int
     players_max: int
+    container_state: Optional[str] = Field(None)
 
 
 class ServerOffline(BaseModel):
@@ -26,12 +30,104 @@ class ServerOffline(BaseModel):
     owner: str
     static: bool = Field(False)
     server_name: str
+    container_state: Optional[str] = Field(None)
 
 
 class ServerResponse(RootModel):
     root: List[Union[ServerOnline, ServerOffline]]
 
 
+class PlayerItem(BaseModel):
+    name: str
+    score: int
+    duration: float
+
+
+class ServerPlayersResponse(BaseModel):
+    server_name: str
+    players: List[PlayerItem]
+
+
+class ServerRulesResponse(BaseModel):
+    server_name: str
+    rules: Dict[str, str]
+
+
+class HistoryPoint(BaseModel):
+    ts: datetime
+    avg_players: float
+    max_players: int
+    online_ratio: float
+
+
+class ServerHistoryResponse(BaseModel):
+    server_name: str
+    resolution: str
+    points: List[HistoryPoint]
+
+
+class NodeRequest(BaseModel):
+    name: str
+    ssh_host: str
+    ssh_port: int = Field(22)
+    ssh_user: str
+    public_ip: str
+    port_min: Optional[int] = Field(None)
+    port_max: Optional[int] = Field(None)
+    max_servers: Optional[int] = Field(None)
+    enabled: bool = Field(True)
+
+
+class NodeItem(BaseModel):
+    id: int
+    name: str
+    ssh_host: str
+    ssh_port: int
+    public_ip: str
+    port_min: Optional[int] = Field(None)
+    port_max: Optional[int] = Field(None)
+    max_servers: Optional[int] = Field(None)
+    enabled: bool
+    free_ports: int = Field(0)
+    servers: int = Field(0)
+    cpu_headroom: Optional[float] = Field(None)
+    mem_headroom: Optional[float] = Field(None)
+
+
+class FileItem(BaseModel):
+    name: str
+    path: str
+    size: int
+    is_dir: bool
+    modified: Optional[datetime] = Field(None)
+
+
+class FileListResponse(BaseModel):
+    server_name: str
+    path: str
+    items: List[FileItem]
+
+
+class ArtifactRequest(BaseModel):
+    kind: str = Field(..., pattern="^(map|workshop|config)$")
+    name: str = Field(..., pattern="^[A-Za-z0-9_.-]+$")
+    url: str
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$")
+    size: Optional[int] = Field(None)
+    workshop_id: Optional[int] = Field(None)
+    map_id: Optional[int] = Field(None, description="Привязать к карте из /maps")
+
+
+class ArtifactItem(BaseModel):
+    sha256: str
+    kind: str
+    name: str
+    url: str
+    size: Optional[int] = Field(None)
+    workshop_id: Optional[int] = Field(None)
+    nodes: List[int] = Field(default_factory=list)
+
+
 class MapItem(BaseModel):
     name: str
     map_id: int
@@ -65,6 +161,29 @@ class ServerRequest(BaseModel):
     server_name: str
 
 
+class BulkServerRequest(BaseModel):
+    server_names: Optional[List[str]] = Field(None, description="Явный список серверов")
+    owner: Optional[str] = Field(None, description="Селектор: все серверы владельца")
+    static: Optional[bool] = Field(None, description="Селектор: статические / временные")
+
+
+class BulkServerResult(BaseModel):
+    server_name: str
+    action: str
+    status: str
+    code: int
+    msg: Optional[str] = Field(None)
+    elapsed: float
+
+
+class BulkServerSummary(BaseModel):
+    action: str
+    total: int
+    succeeded: int
+    failed: int
+    elapsed: float
+
+
 class ServerStartResponse(BaseModel):
     status: str
     data: ServerOnline
@@ -168,20 +287,76 @@ class AuthResponse(BaseModel):
 
 # Decorators for settings
 class SettingsDispatcher:
+    """Обработчики полей /server/settings.
+
+    Независимые обработчики выполняются параллельно слоями; after задаёт
+    поля, которые должны завершиться раньше (например, смена карты до exec
+    конфига). Если обработчик вернул ошибку, зависящие от него пропускаются.
+    """
+
     def __init__(self):
         self.handlers = {}
+        self.after = {}
 
-    def register(self, field_name: str):
+    def register(self, field_name: str, after: Tuple[str, ...] = ()):
         def decorator(handler):
             self.handlers[field_name] = handler
+            self.after[field_name] = tuple(after)
             return handler
 
         return decorator
 
     async def handle(self, data: Dict[str, Any]):
+        fields = [
+            field for field in self.handlers if field in data and field != "server_id"
+        ]
         result = {}
-
-        for field, handler in self.handlers.items():
-            if field in data and field != "server_id":
-                result[field] = await handler(data)
-        return result
+        failed = set()
+
+        for layer in self._layers(fields):
+            runnable = []
+            for field in layer:
+                blocked = [dep for dep in self.after[field] if dep in failed]
+                if blocked:
+                    failed.add(field)
+                    result[field] = ErrorResponse(
+                        status="failed", msg=f"Skipped: {blocked[0]} failed"
+                    ).model_dump()
+                else:
+                    runnable.append(field)
+
+            outcomes = await asyncio.gather(
+                *(self.handlers[field](data) for field in runnable), return_exceptions=True
+            )
+            for field, outcome in zip(runnable, outcomes):
+                if isinstance(outcome, asyncio.CancelledError):
+                    raise outcome
+                if isinstance(outcome, BaseException):
+                    outcome = ErrorResponse(status="error", msg="Unexpected error").model_dump()
+                result[field] = outcome
+
+                if isinstance(outcome, dict):
+                    status = outcome.get("status")
+                else:
+                    status = getattr(outcome, "status", None)
+                if status in ("error", "failed"):
+                    failed.add(field)
+
+        return {field: result[field] for field in fields}
+
+    def _layers(self, fields: List[str]) -> List[List[str]]:
+        # Зависимости от полей, которых нет в запросе, не учитываются
+        pending = {
+            field: [dep for dep in self.after[field] if dep in fields] for field in fields
+        }
+        done = set()
+        layers = []
+        while pending:
+            layer = [field for field, deps in pending.items() if all(dep in done for dep in deps)]
+            if not layer:
+                raise ValueError(f"Cyclic settings dependencies: {list(pending)}")
+            layers.append(layer)
+            for field in layer:
+                done.add(field)
+                del pending[field]
+        return layers
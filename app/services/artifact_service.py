@@ -0,0 +1,240 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from db.database import get_db_connection
+from db.leader import leader
+from services.node_service import Node, nodes
+from core.config import get_settings
+
+import asyncio
+import shlex
+
+
+settings = get_settings()
+
+ARTIFACT_KINDS = ("map", "workshop", "config")
+
+# Каталог карт из кэша внутри контейнера: map artifacts/<name>
+CONTAINER_MAPS_DIR = "/home/steam/cs2-dedicated/game/csgo/maps/artifacts"
+
+
+@dataclass
+class Artifact:
+    sha256: str
+    kind: str
+    name: str
+    url: str
+    size: Optional[int] = None
+    workshop_id: Optional[int] = None
+
+
+class ArtifactCache:
+    """Кэш карт, workshop-предметов и бандлов конфигов на docker-хостах.
+
+    Файлы лежат на хосте по содержимому: <artifact_root>/sha256/<hash>, и
+    скачиваются один раз на хост фоновой синхронизацией у лидера с проверкой
+    sha256. Карты и workshop-предметы жёсткими ссылками собираются в
+    <artifact_root>/maps/<name>.vpk, этот каталог монтируется в контейнеры
+    только на чтение, так что смена карты ничего не скачивает.
+
+    Бандл конфигов распаковывается в общий том игры (cs2_volume_root) один
+    раз на хэш; контейнер на хосте с актуальным бандлом запускается без
+    CS2_CFG_URL и не качает cs2.zip при загрузке.
+    """
+
+    def __init__(self, root: str):
+        self.root = root.rstrip("/")
+
+    def register(self, artifact: Artifact, map_id: Optional[int] = None) -> Artifact:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                if map_id is not None and artifact.kind != "config":
+                    # Файл называется как карта в maps: A2S вернёт это имя
+                    cur.execute("SELECT name FROM maps WHERE map_id = %s", (map_id,))
+                    row = cur.fetchone()
+                    if row is None:
+                        raise LookupError(f"Map {map_id} not found")
+                    artifact.name = row[0]
+
+                cur.execute(
+                    """
+                    INSERT INTO artifacts (sha256, kind, name, url, size, workshop_id)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (sha256) DO UPDATE SET
+                        kind = EXCLUDED.kind,
+                        name = EXCLUDED.name,
+                        url = EXCLUDED.url,
+                        size = EXCLUDED.size,
+                        workshop_id = EXCLUDED.workshop_id
+                    """,
+                    (
+                        artifact.sha256,
+                        artifact.kind,
+                        artifact.name,
+                        artifact.url,
+                        artifact.size,
+                        artifact.workshop_id,
+                    ),
+                )
+                if map_id is not None and artifact.kind != "config":
+                    cur.execute(
+                        """
+                        UPDATE maps SET artifact_sha256 = %s, workshop_id = %s
+                        WHERE map_id = %s
+                        """,
+                        (artifact.sha256, artifact.workshop_id, map_id),
+                    )
+        return artifact
+
+    def listing(self) -> List[Dict]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT artifacts.sha256, kind, name, url, size, workshop_id,
+                        COALESCE(
+                            array_agg(node_artifacts.node_id)
+                                FILTER (WHERE node_artifacts.node_id IS NOT NULL),
+                            '{}'
+                        ) AS nodes
+                    FROM artifacts
+                    LEFT JOIN node_artifacts ON node_artifacts.sha256 = artifacts.sha256
+                    GROUP BY artifacts.sha256
+                    ORDER BY kind, name
+                    """
+                )
+                rows = cur.fetchall()
+                columns = [desc[0] for desc in cur.description]
+                return [dict(zip(columns, row)) for row in rows]
+
+    def config_staged(self, node_id: int) -> bool:
+        """Последний бандл конфигов уже распакован на хосте."""
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT EXISTS (
+                        SELECT 1 FROM node_artifacts WHERE node_id = %s AND sha256 = (
+                            SELECT sha256 FROM artifacts WHERE kind = 'config'
+                            ORDER BY created_at DESC LIMIT 1
+                        )
+                    )
+                    """,
+                    (node_id,),
+                )
+                return cur.fetchone()[0]
+
+    def map_command(self, map_item: Dict, node_id: int) -> str:
+        """RCON-команда смены карты: из кэша хоста, из workshop или встроенная.
+
+        Карта из кэша берётся, только если файл уже лежит на хосте сервера;
+        пока синхронизация не дошла до хоста, карта грузится как раньше.
+        """
+        if map_item.get("artifact_sha256") and self.staged(node_id, map_item["artifact_sha256"]):
+            return f"map artifacts/{map_item['name']}"
+        if map_item.get("workshop_id"):
+            return f"host_workshop_map {map_item['workshop_id']}"
+        return f"map {map_item['name']}"
+
+    def staged(self, node_id: int, sha256: str) -> bool:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT EXISTS (SELECT 1 FROM node_artifacts WHERE node_id = %s AND sha256 = %s)",
+                    (node_id, sha256),
+                )
+                return cur.fetchone()[0]
+
+    async def sync(self):
+        enabled = [node for node in nodes.all() if node.enabled]
+        await asyncio.gather(*(self.sync_node(node) for node in enabled))
+
+    async def sync_node(self, node: Node) -> int:
+        synced = 0
+        for artifact in await asyncio.to_thread(self._missing, node.id):
+            try:
+                await self._stage(node, artifact)
+            except Exception as e:
+                print(f"Artifact {artifact.name} ({artifact.sha256[:12]}) on {node.name}: {e}")
+                continue
+
+            await asyncio.to_thread(self._mark, node.id, artifact.sha256)
+            synced += 1
+
+        if synced:
+            print(f"Synced {synced} artifacts to {node.name}")
+        return synced
+
+    async def _stage(self, node: Node, artifact: Artifact):
+        blob = f"{self.root}/sha256/{artifact.sha256}"
+        # Скачивание во временный файл, в кэш только после проверки хэша
+        script = [
+            "set -e",
+            f"mkdir -p {self.root}/sha256 {self.root}/maps",
+            f"if [ ! -f {blob} ]; then"
+            f" curl -fsSL --retry 3 -o {blob}.part {shlex.quote(artifact.url)}"
+            f" && echo '{artifact.sha256}  {blob}.part' | sha256sum -c --quiet -"
+            f" && mv {blob}.part {blob}"
+            f" || {{ rm -f {blob}.part; exit 1; }};"
+            " fi",
+        ]
+
+        if artifact.kind == "config":
+            volume = settings.cs2_volume_root.rstrip("/")
+            marker = f"{volume}/.artifacts/{artifact.sha256}"
+            script.append(
+                f"if [ ! -f {marker} ]; then"
+                f" unzip -oq {blob} -d {volume}/game/csgo"
+                f" && mkdir -p {volume}/.artifacts && touch {marker};"
+                " fi"
+            )
+        else:
+            # Жёсткая ссылка: в контейнер монтируется только maps/, симлинк туда бы не вёл
+            target = f"{self.root}/maps/{shlex.quote(artifact.name)}.vpk"
+            script.append(f"ln -f {blob} {target}")
+
+        result = await nodes.ssh(node).run("; ".join(script))
+        if result.exit_status:
+            raise RuntimeError(result.stderr.strip() or f"exit status {result.exit_status}")
+
+    def _missing(self, node_id: int) -> List[Artifact]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Конфиги первыми: от них зависит запуск контейнеров без скачивания
+                cur.execute(
+                    """
+                    SELECT sha256, kind, name, url, size, workshop_id FROM artifacts
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM node_artifacts
+                        WHERE node_artifacts.node_id = %s
+                          AND node_artifacts.sha256 = artifacts.sha256
+                    )
+                    ORDER BY kind = 'config' DESC, created_at
+                    """,
+                    (node_id,),
+                )
+                return [Artifact(*row) for row in cur.fetchall()]
+
+    def _mark(self, node_id: int, sha256: str):
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO node_artifacts (node_id, sha256) VALUES (%s, %s)
+                    ON CONFLICT (node_id, sha256) DO UPDATE SET synced_at = CURRENT_TIMESTAMP
+                    """,
+                    (node_id, sha256),
+                )
+
+
+artifact_cache = ArtifactCache(root=settings.artifact_root)
+
+
+@leader.singleton("artifact_sync")
+async def sync_artifacts():
+    while True:
+        try:
+            await artifact_cache.sync()
+        except Exception as e:
+            print(f"Artifact sync error: {e}")
+        await asyncio.sleep(settings.artifact_sync_interval)
@@ -191,6 +191,16 @@ class AuthService:
             )
             raise HTTPException(status_code=400, detail=error_response)
 
+    def get_current_admin(self, request: Request) -> UserPayload:
+        current_user = self.get_current_user(request)
+
+        if current_user.role != "admin":
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="You don't have permissions")
+            )
+            raise HTTPException(status_code=403, detail=error_response)
+        return current_user
+
     def get_current_user_optional(self, request: Request) -> UserPayload:
         token = request.cookies.get("user_access_token")
 
@@ -0,0 +1,61 @@
+from typing import Dict, Optional
+
+from core.single_flight import SingleFlight
+from services.ssh_service import SSHManager
+from core.config import get_settings
+
+import json
+import time
+
+
+settings = get_settings()
+
+
+class ContainerStateCache:
+    """Состояния всех контейнеров хоста одной командой `docker ps -a`.
+
+    Результат кэшируется на несколько секунд, конкурентные загрузки
+    склеиваются в одну SSH-команду.
+    """
+
+    def __init__(self, ssh: SSHManager, ttl: float):
+        self.ssh = ssh
+        self.ttl = ttl
+        self._states: Dict[str, str] = {}
+        self._loaded_at = 0.0
+        self._flight = SingleFlight()
+
+    async def all(self) -> Dict[str, str]:
+        if time.monotonic() - self._loaded_at <= self.ttl:
+            return self._states
+        return await self._flight.do("ps", self._load)
+
+    async def get(self, name: str) -> Optional[str]:
+        states = await self.all()
+        return states.get(name)
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+    def apply(self, name: str, state: Optional[str]):
+        """Состояние из docker events: кэш остаётся актуальным без `docker ps`."""
+        states = dict(self._states)
+        if state is None:
+            states.pop(name, None)
+        else:
+            states[name] = state
+        self._states = states
+
+    async def _load(self) -> Dict[str, str]:
+        result = await self.ssh.run("docker ps -a --no-trunc --format '{{json .}}'")
+
+        states = {}
+        for line in result.stdout.splitlines():
+            if not line.strip():
+                continue
+            container = json.loads(line)
+            states[container["Names"]] = container["State"]
+
+        self._states = states
+        self._loaded_at = time.monotonic()
+        return states
@@ -1,17 +1,33 @@
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from datetime import datetime
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from datetime import datetime, timedelta, timezone
 
 from services.port_service import PortManager
 from services.steam_service import SteamService
+from services.server_registry import server_registry, etag_for
+from services.node_service import nodes
+from services.query_service import query_service
+from services.status_stream import status_broadcaster
+from services.status_sync import publish_lifecycle_event
+from services.history_service import history_service
+from services.provisioning import provisioner, ProvisioningError
+from services.warm_pool import warm_pool
+from services.operation_lock import server_operations
+from services.log_stream import log_streams
+from services.file_service import PathNotAllowed, content_disposition, parse_range, server_files
 from db.database import get_db_connection
+from db.leader import leader
 from handlers.handler import dispatcher
 from core.config import get_settings
 from models.models import *
 
 import asyncio
+import json
+import re
+import time
 import a2s
-import aiohttp
+import orjson
 import asyncssh
 
 settings = get_settings()
@@ -19,21 +35,54 @@ docker_port = PortManager()
 steam = SteamService()
 
 
+def _etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match сравнивается слабо: W/"x" совпадает с "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
 class CS2Service:
-    async def list_servers(self):
+    async def list_servers(self, if_none_match=None, **query):
         try:
-            servers, maps = self._fetch_servers_and_maps()
-            map_name_to_id = {map_item["name"]: map_item["map_id"] for map_item in maps}
+            await server_registry.all()
 
-            # servers = [server for server in servers if server.get("static") is True]
+            headers = {"Cache-Control": f"public, max-age={settings.servers_max_age}"}
+            if server_registry.cache.stale:
+                # Снимок из чекпоинта после рестарта: клиенту не кэшировать
+                headers["Cache-Control"] = "no-cache"
+                headers["X-Snapshot-Stale"] = "true"
 
-            results = await asyncio.gather(
-                *(
-                    self._check_server_status(server, map_name_to_id)
-                    for server in servers
-                )
-            )
-            return results
+            if any(value is not None for value in query.values()):
+                try:
+                    page, total, next_cursor = server_registry.fleet_index().query(
+                        **{key: value for key, value in query.items() if value is not None}
+                    )
+                except ValueError as e:
+                    error_response = jsonable_encoder(
+                        ErrorResponse(status="failed", msg=str(e))
+                    )
+                    return JSONResponse(status_code=400, content=error_response)
+
+                body = orjson.dumps([status.model_dump() for status in page])
+                headers["X-Total-Count"] = str(total)
+                if next_cursor:
+                    headers["X-Next-Cursor"] = next_cursor
+                etag = etag_for(body)
+            else:
+                # Отдаём текущее содержимое кэша: оно не старее результата all()
+                # и уже сериализовано под свой ETag, без повторной валидации моделей
+                etag, body = server_registry.fleet_view()
+
+            headers["ETag"] = etag
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=headers)
+
+            return Response(content=body, media_type="application/json", headers=headers)
 
         except Exception as e:
             error_response = jsonable_encoder(
@@ -43,16 +92,11 @@ class CS2Service:
 
     async def list_server_by_owner(self, owner):
         try:
-            servers, maps = self._fetch_servers_by_owner(owner=owner)
-            map_name_to_id = {map_item["name"]: map_item["map_id"] for map_item in maps}
-
-            result = await asyncio.gather(
-                *(
-                    self._check_server_status(server, map_name_to_id)
-                    for server in servers
-                )
+            servers = await server_registry.by_owner(owner)
+            return Response(
+                content=orjson.dumps([server.model_dump() for server in servers]),
+                media_type="application/json",
             )
-            return result
 
         except Exception as e:
             error_response = jsonable_encoder(
@@ -60,150 +104,288 @@ class CS2Service:
             )
             return JSONResponse(status_code=500, content=error_response)
 
-    async def list_maps(self):
-        try:
-            with get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT name, map_id FROM maps")
-                    maps = cur.fetchall()
-                    columns = [desc[0] for desc in cur.description]
-                    maps_list = [dict(zip(columns, row)) for row in maps]
+    async def list_server_players(self, server_name: str):
+        server = await self._get_online_server(server_name)
+        if isinstance(server, JSONResponse):
+            return server
 
-                    map_items = [MapItem(**map_dict) for map_dict in maps_list]
-                    return map_items
+        try:
+            players = await query_service.players(server)
+            return ServerPlayersResponse(server_name=server_name, players=players)
 
-        except Exception:
+        except Exception as e:
             error_response = jsonable_encoder(
-                ErrorResponse(status="error", msg="Internal server error")
+                ErrorResponse(status="error", msg=f"Couldn't query players: {e}")
             )
             return JSONResponse(status_code=500, content=error_response)
 
-    async def create_server(self, request: CreateServerRequest, owner):
+    async def list_server_rules(self, server_name: str):
+        server = await self._get_online_server(server_name)
+        if isinstance(server, JSONResponse):
+            return server
+
         try:
-            server_steamid, srcd_token = await steam.get_srcds_token(
-                server_name=request.server_name
+            rules = await query_service.rules(server)
+            return ServerRulesResponse(server_name=server_name, rules=rules)
+
+        except Exception as e:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="error", msg=f"Couldn't query rules: {e}")
             )
+            return JSONResponse(status_code=500, content=error_response)
 
-            server_name = self._get_name_server_from_db(name=request.server_name)
-            if server_name is not None:
-                error_response = jsonable_encoder(
-                    ErrorResponse(status="failed", msg="Server name already exists")
-                )
-                return JSONResponse(status_code=409, content=error_response)
+    async def server_history(self, server_name: str, start=None, end=None, resolution=None):
+        end = end or datetime.now(timezone.utc)
+        start = start or end - timedelta(hours=1)
+        # Время без зоны считаем UTC
+        end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+        start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+        if start >= end:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="error", msg="start must be earlier than end")
+            )
+            return JSONResponse(status_code=400, content=error_response)
 
-            port = docker_port.get_free_port()
+        # Больше суток поминутно не отдаём: слишком много точек
+        if resolution is None:
+            resolution = "1h" if end - start > timedelta(days=1) else "1m"
 
-            self._insert_server_into_db(
-                port=port,
-                name=request.server_name,
-                owner=owner.username,
-                static=request.static,
-                server_steamid=server_steamid,
-                srcd_token=srcd_token,
+        try:
+            points = history_service.history(server_name, start, end, resolution)
+            return ServerHistoryResponse(
+                server_name=server_name, resolution=resolution, points=points
             )
 
-            occupy_port = docker_port.occupy_port(
-                port=port, container_name=request.server_name
+        except Exception as e:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="error", msg=f"Internal server error: {e}")
             )
-            if not occupy_port:
-                error_response = jsonable_encoder(
-                    ErrorResponse(
-                        status="failed",
-                        msg="Failed to occupy port",
-                    )
-                )
-                return JSONResponse(status_code=503, content=error_response)
-
-            async with asyncssh.connect(
-                settings.ssh_host,
-                username=settings.ssh_user,
-                client_keys=["ssh_key"],
-                known_hosts=None,
-            ) as ssh:
-                command = f"""docker run -dit --name={request.server_name} \
-                -e SRCDS_TOKEN="{srcd_token}" \
-                -e CS2_CFG_URL="https://file.linfed.ru/cs2.zip" \
-                -e CS2_RCONPW="{settings.rcon_password}" \
-                -e CS2_PW="{request.password}" \
-                -v /home/cs/cs2-docker:/home/steam/cs2-dedicated \
-                -p {port}:27015/tcp -p {port}:27015/udp \
-                joedwards32/cs2"""
-
-                result = await ssh.run(command)
-                if result.stderr:
-                    error_response = jsonable_encoder(
-                        ErrorResponse(status="error", msg="SSH Error")
-                    )
-                    return JSONResponse(status_code=500, content=error_response)
-
-
-            timeout_seconds = 60
-            check_interval = 1
-            start_time = datetime.now()
-
-            async with aiohttp.ClientSession() as session:
-                while (datetime.now() - start_time).seconds < timeout_seconds:
-                    try:
-                        async with session.get(
-                            f"{settings.host_url}/api/cs2/servers", timeout=5
-                        ) as response:
-                            servers = await response.json()
-                            server = next(
-                                (
-                                    s
-                                    for s in servers
-                                    if s.get("server_name") == request.server_name
-                                ),
-                                None,
-                            )
-                            if not server:
-                                error_response = jsonable_encoder(
-                                    ErrorResponse(
-                                        status="error", msg="Server not found in db"
-                                    )
-                                )
-                                return JSONResponse(
-                                    status_code=400, content=error_response
-                                )
-
-                            if server.get("status") == "online":
-                                server_data = ServerOnline(**server)
-
-                                if server.get("static") == False:
-                                    print("started task")
-                                    asyncio.create_task(
-                                        self._monitoring_server_activity(
-                                            request.server_name
-                                        )
-                                    )
-
-                                return CreateServerResponse(
-                                    status="success", data=server_data
-                                )
-
-                            await asyncio.sleep(check_interval)
-                            continue
-
-                    except (aiohttp.ClientError, asyncio.TimeoutError):
-                        await asyncio.sleep(check_interval)
+            return JSONResponse(status_code=500, content=error_response)
+
+    async def stream_servers(self, owner=None):
+        subscriber = status_broadcaster.subscribe(owner)
+
+        async def event_stream():
+            try:
+                async for message in status_broadcaster.events(subscriber):
+                    if message is None:
+                        yield ": keepalive\n\n"
                         continue
+                    yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+            finally:
+                status_broadcaster.unsubscribe(subscriber)
 
-                await self._delete_server_container(request.server_name)
-                error_response = jsonable_encoder(
-                    ErrorResponse(
-                        status="failed",
-                        msg="Request Timeout - server didn't start",
-                    )
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def stream_servers_ws(self, websocket: WebSocket, owner=None):
+        await websocket.accept()
+        subscriber = status_broadcaster.subscribe(owner)
+
+        try:
+            async for message in status_broadcaster.events(subscriber):
+                await websocket.send_json(message or {"type": "keepalive"})
+
+        except WebSocketDisconnect:
+            print("Client disconnected")
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+        finally:
+            status_broadcaster.unsubscribe(subscriber)
+
+    async def stream_logs_ws(self, websocket: WebSocket, server_name: str, tail: int, grep=None):
+        try:
+            pattern = re.compile(grep) if grep else None
+        except re.error:
+            await websocket.close(code=1008, reason="Invalid grep pattern")
+            return
+
+        if await asyncio.to_thread(self._get_name_server_from_db, server_name) is None:
+            await websocket.close(code=1008, reason="Server not found")
+            return
+
+        await websocket.accept()
+        viewer = log_streams.subscribe(server_name, tail=tail, pattern=pattern)
+
+        try:
+            async for message in log_streams.batches(viewer):
+                await websocket.send_json(message or {"type": "keepalive"})
+
+        except WebSocketDisconnect:
+            print("Client disconnected")
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+        finally:
+            log_streams.unsubscribe(server_name, viewer)
+
+    async def list_files(self, server_name: str, path: str = ""):
+        error = await self._check_file_access(server_name)
+        if error is not None:
+            return error
+
+        try:
+            current, items = await server_files.listdir(server_name, path)
+        except PathNotAllowed:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Path is outside of the server volume")
+            )
+            return JSONResponse(status_code=400, content=error_response)
+        except asyncssh.SFTPNoSuchFile:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Path not found")
+            )
+            return JSONResponse(status_code=404, content=error_response)
+        except (asyncssh.Error, OSError):
+            error_response = jsonable_encoder(
+                ErrorResponse(status="error", msg="SFTP error")
+            )
+            return JSONResponse(status_code=500, content=error_response)
+
+        return FileListResponse(
+            server_name=server_name,
+            path=current,
+            items=[FileItem(**item.__dict__) for item in items],
+        )
+
+    async def download_file(self, server_name: str, path: str, range_header=None):
+        error = await self._check_file_access(server_name)
+        if error is not None:
+            return error
+
+        try:
+            file = await server_files.stat(server_name, path)
+        except PathNotAllowed:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Path is outside of the server volume")
+            )
+            return JSONResponse(status_code=400, content=error_response)
+        except asyncssh.SFTPNoSuchFile:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="File not found")
+            )
+            return JSONResponse(status_code=404, content=error_response)
+        except (asyncssh.Error, OSError):
+            error_response = jsonable_encoder(
+                ErrorResponse(status="error", msg="SFTP error")
+            )
+            return JSONResponse(status_code=500, content=error_response)
+
+        if file.is_dir:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Path is a directory")
+            )
+            return JSONResponse(status_code=400, content=error_response)
+
+        try:
+            byte_range = parse_range(range_header, file.size)
+        except ValueError:
+            return Response(
+                status_code=416, headers={"Content-Range": f"bytes */{file.size}"}
+            )
+
+        start, end = byte_range or (0, file.size - 1)
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(max(end - start + 1, 0)),
+            "Content-Disposition": content_disposition(file.name),
+        }
+        if file.modified is not None:
+            headers["Last-Modified"] = file.modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+        if byte_range is not None:
+            headers["Content-Range"] = f"bytes {start}-{end}/{file.size}"
+
+        return StreamingResponse(
+            server_files.read(server_name, file, start, end),
+            status_code=206 if byte_range is not None else 200,
+            media_type="application/octet-stream",
+            headers=headers,
+        )
+
+    async def _check_file_access(self, server_name: str):
+        if await asyncio.to_thread(self._get_name_server_from_db, server_name) is None:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Server not found")
+            )
+            return JSONResponse(status_code=400, content=error_response)
+        return None
+
+    async def list_maps(self, response: Response, if_none_match=None):
+        try:
+            etag = server_registry.maps_etag()
+            cache_control = f"public, max-age={settings.maps_max_age}"
+            if _etag_matches(if_none_match, etag):
+                return Response(
+                    status_code=304,
+                    headers={"ETag": etag, "Cache-Control": cache_control},
                 )
-                return JSONResponse(status_code=408, content=error_response)
 
-        except asyncssh.Error as e:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = cache_control
+            map_items = [MapItem(**map_dict) for map_dict in server_registry.maps()]
+            return map_items
+
+        except Exception:
             error_response = jsonable_encoder(
-                ErrorResponse(status="error", msg=f"SSH connection error: {str(e)}")
+                ErrorResponse(status="error", msg="Internal server error")
             )
             return JSONResponse(status_code=500, content=error_response)
 
-    async def start_server(self, request: ServerRequest):
+    async def create_server(self, request: CreateServerRequest, owner, idempotency_key=None):
+        # В БД попадает только sha256 запроса, пароль не хранится
+        fingerprint = json.dumps(
+            {**request.model_dump(), "owner": owner.username}, sort_keys=True
+        )
+        return await server_operations.run(
+            "create",
+            request.server_name,
+            lambda: self._create_server(request, owner),
+            idempotency_key=idempotency_key,
+            fingerprint=fingerprint,
+        )
+
+    async def _create_server(self, request: CreateServerRequest, owner):
+        try:
+            context = await warm_pool.claim(request, owner=owner.username)
+            if warm_pool.enabled:
+                warm_pool.record_demand(pooled=context is not None)
+            if context is None:
+                context = await provisioner.create(request, owner=owner.username)
+            return CreateServerResponse(status="success", data=context.server.to_model())
+
+        except ProvisioningError as e:
+            error_response = jsonable_encoder(ErrorResponse(status=e.status, msg=e.msg))
+            return JSONResponse(
+                status_code=e.status_code, content=error_response, headers=e.headers
+            )
+
+    async def start_server(self, request: ServerRequest, idempotency_key=None):
+        return await server_operations.run(
+            "start",
+            request.server_name,
+            lambda: self._start_server(request),
+            idempotency_key=idempotency_key,
+        )
+
+    async def stop_server(self, request: ServerRequest, idempotency_key=None):
+        return await server_operations.run(
+            "stop",
+            request.server_name,
+            lambda: self._stop_server(request),
+            idempotency_key=idempotency_key,
+        )
+
+    async def delete_server(self, server_name: str, idempotency_key=None):
+        return await server_operations.run(
+            "delete",
+            server_name,
+            lambda: self._delete_server_container(server_name),
+            idempotency_key=idempotency_key,
+        )
+
+    async def _start_server(self, request: ServerRequest):
         server_name = request.server_name
 
         if not server_name:
@@ -215,69 +397,39 @@ class CS2Service:
             return JSONResponse(status_code=422, content=error_response)
 
         try:
-            async with asyncssh.connect(
-                settings.ssh_host,
-                username=settings.ssh_user,
-                client_keys=["ssh_key"],
-                known_hosts=None,
-            ) as ssh:
-                result = await ssh.run(f"docker start {server_name}")
-
-                if result.stderr:
-                    error_response = jsonable_encoder(
-                        ErrorResponse(status="error", msg="SSH Error")
-                    )
-                    return JSONResponse(status_code=500, content=error_response)
-
-                timeout_seconds = 60
-                check_interval = 1
-                start_time = datetime.now()
-
-                async with aiohttp.ClientSession() as session:
-                    while (datetime.now() - start_time).seconds < timeout_seconds:
-                        try:
-                            async with session.get(
-                                f"{settings.host_url}/api/cs2/servers", timeout=5
-                            ) as response:
-                                servers = await response.json()
-                                server = next(
-                                    (
-                                        s
-                                        for s in servers
-                                        if s.get("server_name") == server_name
-                                    ),
-                                    None,
-                                )
-                                if not server:
-                                    error_response = jsonable_encoder(
-                                        ErrorResponse(
-                                            status="error", msg="Server not found"
-                                        )
-                                    )
-                                    return JSONResponse(
-                                        status_code=400, content=error_response
-                                    )
-
-                                if server.get("status") == "online":
-                                    server_data = ServerOnline(**server)
-                                    return ServerStartResponse(
-                                        status="success", data=server_data
-                                    )
-
-                                await asyncio.sleep(check_interval)
-                                continue
-
-                        except (aiohttp.ClientError, asyncio.TimeoutError):
-                            await asyncio.sleep(check_interval)
-                            continue
+            result = await nodes.ssh_for_server(server_name).run(f"docker start {server_name}")
 
-                    error_response = jsonable_encoder(
-                        ErrorResponse(
-                            status="failed",
-                            msg="Request Timeout",
-                        )
-                    )
-                    return JSONResponse(status_code=408, content=error_response)
+            if result.stderr:
+                error_response = jsonable_encoder(
+                    ErrorResponse(status="error", msg="SSH Error")
+                )
+                return JSONResponse(status_code=500, content=error_response)
+
+            await publish_lifecycle_event(server_name)
+
+            # Контейнер поднят, ждём ответа A2S: проба раз в несколько секунд
+            server = await server_registry.wait_for(
+                server_name,
+                lambda status: status.status == "online",
+                timeout=settings.server_start_timeout,
+                probe_interval=settings.readiness_probe_interval,
+            )
+            if not server:
+                error_response = jsonable_encoder(
+                    ErrorResponse(status="error", msg="Server not found")
+                )
+                return JSONResponse(status_code=400, content=error_response)
+
+            if server.status == "online":
+                return ServerStartResponse(status="success", data=server.to_model())
+
+            error_response = jsonable_encoder(
+                ErrorResponse(
+                    status="failed",
+                    msg="Request Timeout",
+                )
+            )
+            return JSONResponse(status_code=408, content=error_response)
 
         except asyncssh.Error as e:
             error_response = jsonable_encoder(
@@ -285,7 +437,7 @@ class CS2Service:
             )
             return JSONResponse(status_code=500, content=error_response)
 
-    async def stop_server(self, request: ServerRequest):
+    async def _stop_server(self, request: ServerRequest):
         server_name = request.server_name
 
         if not server_name:
@@ -297,101 +449,61 @@ class CS2Service:
             return JSONResponse(status_code=422, content=error_response)
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{settings.host_url}/api/cs2/servers", timeout=5
-                ) as response:
-                    servers = await response.json()
-                    server = next(
-                        (s for s in servers if s.get("server_name") == server_name),
-                        None,
+            server = await server_registry.get(server_name, fresh=True)
+            if not server:
+                error_response = jsonable_encoder(
+                    ErrorResponse(status="error", msg="Server not found")
+                )
+                return JSONResponse(
+                    status_code=400,
+                    content=error_response,
+                )
+            if (server.players_current or 0) >= 1:
+                error_response = jsonable_encoder(
+                    ErrorResponse(
+                        status="failed",
+                        msg="You can't stop the server while there are players on it",
                     )
-                    if not server:
-                        error_response = jsonable_encoder(
-                            ErrorResponse(status="error", msg="Server not found")
-                        )
-                        return JSONResponse(
-                            status_code=400,
-                            content=error_response,
-                        )
-                    if server.get("players_current") >= 1:
-                        error_response = jsonable_encoder(
-                            ErrorResponse(
-                                status="failed",
-                                msg="You can't stop the server while there are players on it",
-                            )
-                        )
-                        return JSONResponse(status_code=409, content=error_response)
-
-        except aiohttp.ClientError:
+                )
+                return JSONResponse(status_code=409, content=error_response)
+
+        except Exception:
             error_response = jsonable_encoder(
                 ErrorResponse(status="error", msg="Couldn't check server status")
             )
             return JSONResponse(status_code=500, content=error_response)
 
         try:
-            async with asyncssh.connect(
-                settings.ssh_host,
-                username=settings.ssh_user,
-                client_keys=["ssh_key"],
-                known_hosts=None,
-            ) as ssh:
-                result = await ssh.run(f"docker stop {server_name}")
-
-                if result.stderr:
-                    error_response = jsonable_encoder(
-                        ErrorResponse(status="error", msg="SSH Error")
-                    )
-                    return JSONResponse(status_code=500, content=error_response)
-
-                timeout_seconds = 60
-                check_interval = 1
-                start_time = datetime.now()
-
-                async with aiohttp.ClientSession() as session:
-                    while (datetime.now() - start_time).seconds < timeout_seconds:
-                        try:
-                            async with session.get(
-                                f"{settings.host_url}/api/cs2/servers", timeout=5
-                            ) as response:
-                                servers = await response.json()
-
-                                if server := next(
-                                    (
-                                        s
-                                        for s in servers
-                                        if s.get("server_name") == server_name
-                                    ),
-                                    None,
-                                ):
-                                    if not server:
-                                        error_response = jsonable_encoder(
-                                            ErrorResponse(
-                                                status="error", msg="Server not found"
-                                            )
-                                        )
-                                        return JSONResponse(
-                                            status_code=400,
-                                            content=error_response,
-                                        )
-
-                                    if server.get("status") == "offline":
-                                        server_data = ServerOffline(**server)
-                                        return ServerStopResponse(
-                                            status="success", data=server_data
-                                        )
-
-                                    await asyncio.sleep(check_interval)
-                                    continue
-
-                        except (aiohttp.ClientError, asyncio.TimeoutError):
-                            await asyncio.sleep(check_interval)
-                            continue
+            result = await nodes.ssh_for_server(server_name).run(f"docker stop {server_name}")
 
-                    error_response = jsonable_encoder(
-                        ErrorResponse(status="failed", msg="Request Timeout")
-                    )
-                    return JSONResponse(status_code=408, content=error_response)
+            if result.stderr:
+                error_response = jsonable_encoder(
+                    ErrorResponse(status="error", msg="SSH Error")
+                )
+                return JSONResponse(status_code=500, content=error_response)
+
+            await publish_lifecycle_event(server_name)
+
+            # Остановку сообщает событие die; опрос только на случай потери событий
+            server = await server_registry.wait_for(
+                server_name,
+                lambda status: status.status == "offline",
+                timeout=settings.server_stop_timeout,
+                probe_interval=settings.readiness_fallback_interval,
+            )
+            if not server:
+                error_response = jsonable_encoder(
+                    ErrorResponse(status="error", msg="Server not found")
+                )
+                return JSONResponse(status_code=400, content=error_response)
+
+            if server.status == "offline":
+                return ServerStopResponse(status="success", data=server.to_model())
+
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Request Timeout")
+            )
+            return JSONResponse(status_code=408, content=error_response)
 
         except asyncssh.Error as e:
             error_response = jsonable_encoder(
@@ -399,6 +511,108 @@ class CS2Service:
             )
             return JSONResponse(status_code=500, content=error_response)
 
+    async def bulk_lifecycle(self, action: str, request: BulkServerRequest):
+        """Массовый start/stop/delete для админов.
+
+        Серверы обрабатываются параллельно, не больше bulk_concurrency
+        одновременно, через общие SSH-соединения хостов. Ответ: NDJSON,
+        строка на каждый сервер по мере готовности и сводка последней строкой.
+        """
+        operations = {
+            "start": lambda name: self.start_server(ServerRequest(server_name=name)),
+            "stop": lambda name: self.stop_server(ServerRequest(server_name=name)),
+            "delete": self.delete_server,
+        }
+        operation = operations[action]
+
+        if not request.server_names and request.owner is None and request.static is None:
+            error_response = jsonable_encoder(
+                ErrorResponse(
+                    status="failed",
+                    msg="Validation Error - pass server_names or owner/static selector",
+                )
+            )
+            return JSONResponse(status_code=422, content=error_response)
+
+        try:
+            names = await asyncio.to_thread(self._select_servers, request)
+        except Exception:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="error", msg="Couldn't select servers")
+            )
+            return JSONResponse(status_code=500, content=error_response)
+
+        missing = [
+            name for name in dict.fromkeys(request.server_names or ()) if name not in names
+        ]
+        semaphore = asyncio.Semaphore(max(int(settings.bulk_concurrency), 1))
+
+        async def run(name: str) -> BulkServerResult:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await operation(name)
+                except Exception as e:
+                    result = e
+                return _bulk_result(name, action, result, time.perf_counter() - started)
+
+        async def stream():
+            started = time.perf_counter()
+            succeeded = failed = 0
+
+            for name in missing:
+                failed += 1
+                result = BulkServerResult(
+                    server_name=name,
+                    action=action,
+                    status="failed",
+                    code=400,
+                    msg="Server not found",
+                    elapsed=0.0,
+                )
+                yield orjson.dumps(result.model_dump()) + b"\n"
+
+            # Задачи не отменяются при обрыве клиента: docker start/stop уже отправлен
+            tasks = [asyncio.create_task(run(name)) for name in names]
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                if result.code < 400:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield orjson.dumps(result.model_dump()) + b"\n"
+
+            summary = BulkServerSummary(
+                action=action,
+                total=len(names) + len(missing),
+                succeeded=succeeded,
+                failed=failed,
+                elapsed=round(time.perf_counter() - started, 3),
+            )
+            yield orjson.dumps({"summary": summary.model_dump()}) + b"\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    def _select_servers(self, request: BulkServerRequest) -> List[str]:
+        conditions, params = [], []
+        if request.server_names:
+            conditions.append("name = ANY(%s)")
+            params.append(list(request.server_names))
+        if request.owner is not None:
+            conditions.append("owner = %s")
+            params.append(request.owner)
+        if request.static is not None:
+            conditions.append("static = %s")
+            params.append(request.static)
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT name FROM servers WHERE {' AND '.join(conditions)} ORDER BY name",
+                    params,
+                )
+                return [row[0] for row in cur.fetchall()]
+
     async def execute_commands(self, request: ServerSettingsRequest):
         try:
             data = request.model_dump(exclude_unset=True)
@@ -445,35 +659,21 @@ class CS2Service:
             )
             return JSONResponse(status_code=500, content=error_response)
 
-    def _fetch_servers_and_maps(self):
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT * FROM servers")
-                servers = cur.fetchall()
-                servers_columns = [desc[0] for desc in cur.description]
-                server_list = [dict(zip(servers_columns, row)) for row in servers]
-
-                cur.execute("SELECT name, map_id FROM maps")
-                maps = cur.fetchall()
-                maps_columns = [desc[0] for desc in cur.description]
-                maps_list = [dict(zip(maps_columns, row)) for row in maps]
-
-                return server_list, maps_list
-
-    def _fetch_servers_by_owner(self, owner):
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT * FROM servers WHERE owner = %s", (owner,))
-                servers = cur.fetchall()
-                servers_colums = [desc[0] for desc in cur.description]
-                server_list = [dict(zip(servers_colums, row)) for row in servers]
+    async def _get_online_server(self, server_name: str):
+        server = await server_registry.get(server_name)
+        if not server:
+            error_response = jsonable_encoder(
+                ErrorResponse(status="error", msg="Server not found")
+            )
+            return JSONResponse(status_code=400, content=error_response)
 
-                cur.execute("SELECT name, map_id FROM maps")
-                maps = cur.fetchall()
-                maps_colums = [desc[0] for desc in cur.description]
-                maps_list = [dict(zip(maps_colums, row)) for row in maps]
+        if server.status != "online":
+            error_response = jsonable_encoder(
+                ErrorResponse(status="failed", msg="Server is offline")
+            )
+            return JSONResponse(status_code=409, content=error_response)
 
-                return server_list, maps_list
+        return server
 
     def _get_name_server_from_db(self, name):
         with get_db_connection() as conn:
@@ -493,111 +693,70 @@ class CS2Service:
 
                 return result
 
-    def _insert_server_into_db(
-        self, name, port, owner, static, server_steamid, srcd_token
-    ):
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO servers (name, port, owner, static, server_steamid, srcd_token) VALUES (%s, %s, %s, %s, %s, %s)",
-                    (name, port, owner, static, server_steamid, srcd_token),
-                )
-
     def _delete_server_from_db(sefl, server_name: str):
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM servers WHERE name = %s", (server_name,))
 
-    async def _check_server_status(self, server, map_name_to_id):
-        try:
-            address = (server["ip"], server["port"])
-            info = await a2s.ainfo(address)
-            map_id = map_name_to_id.get(info.map_name)
-
-            return ServerOnline(
-                status="online",
-                owner=server["owner"],
-                static=server["static"],
-                server_name=server["name"],
-                ip=server["ip"],
-                port=server["port"],
-                map_id=map_id,
-                players_current=int(info.player_count),
-                players_max=info.max_players,
-            )
-
-        except Exception as e:
-            return ServerOffline(
-                status="offline",
-                owner=server["owner"],
-                static=server["static"],
-                server_name=server["name"],
-            )
-
-    async def _monitoring_server_activity(self, server_name: str):
-        empty_minute = 0
+    async def _monitoring_server_activity(self):
+        empty_minutes = {}
         max_empty_minute = settings.max_empty_minute
 
-        async with aiohttp.ClientSession() as session:
-            while empty_minute < max_empty_minute:
-                await asyncio.sleep(60)
+        while True:
+            await asyncio.sleep(60)
 
-                try:
-                    async with session.get(
-                        f"{settings.host_url}/api/cs2/servers", timeout=5
-                    ) as response:
-                        servers = await response.json()
-                        server = next(
-                            (s for s in servers if s.get("server_name") == server_name),
-                            None,
-                        )
-
-                        if not server:
-                            return
-
-                        players_current = server.get("players_current")
-
-                        if players_current == 0:
-                            empty_minute += 1
-                        else:
-                            if empty_minute > 0:
-                                empty_minute = 0
-
-                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            try:
+                servers = await server_registry.all()
+            except Exception as e:
+                continue
+
+            watched = set()
+            for server in servers:
+                if server.static:
                     continue
 
+                watched.add(server.server_name)
+                if server.players_current == 0:
+                    empty_minutes[server.server_name] = (
+                        empty_minutes.get(server.server_name, 0) + 1
+                    )
+                else:
+                    empty_minutes[server.server_name] = 0
 
-        await self._delete_server_container(server_name)
+            for server_name in list(empty_minutes):
+                if server_name not in watched:
+                    del empty_minutes[server_name]
+                elif empty_minutes[server_name] >= max_empty_minute:
+                    del empty_minutes[server_name]
+                    await self.delete_server(server_name)
 
     async def _delete_server_container(self, server_name: str):
         try:
             server = self._get_name_server_from_db(name=server_name)
-            if server is not None:
+            if server is None:
                 error_response = jsonable_encoder(
                     ErrorResponse(status="failed", msg="Server not found")
                 )
                 return JSONResponse(status_code=400, content=error_response)
 
-            async with asyncssh.connect(
-                settings.ssh_host,
-                username=settings.ssh_user,
-                client_keys=["ssh_key"],
-                known_hosts=None,
-            ) as ssh:
-                stop_command = f"docker stop {server_name}"
-                await ssh.run(stop_command)
+            ssh = nodes.ssh_for_server(server_name)
 
-                rm_command = f"docker rm {server_name}"
-                result = await ssh.run(rm_command)
+            stop_command = f"docker stop {server_name}"
+            await ssh.run(stop_command)
 
-                if result.stderr:
-                    return False
+            rm_command = f"docker rm {server_name}"
+            result = await ssh.run(rm_command)
+
+            if result.stderr:
+                return False
 
             server_steamid = self._get_server_steam_id_from_db(server_name)
             await steam.delete_srcds_token(server_steamid)
 
             docker_port.release_port(server_name)
             self._delete_server_from_db(server_name)
+            server_registry.invalidate(server_name)
+            await publish_lifecycle_event(server_name)
 
 
             return DeleteServerResponse(
@@ -607,3 +766,32 @@ class CS2Service:
 
         except asyncssh.Error as e:
             return False
+
+
+def _bulk_result(name: str, action: str, result, elapsed: float) -> BulkServerResult:
+    """Ответ одиночной операции (модель, JSONResponse, False или исключение)
+    в строку NDJSON-потока.
+    """
+    if isinstance(result, JSONResponse):
+        body = json.loads(result.body)
+        code, status, msg = result.status_code, body.get("status", "failed"), body.get("msg")
+    elif isinstance(result, Exception):
+        code, status, msg = 500, "error", str(result) or type(result).__name__
+    elif not result:
+        code, status, msg = 500, "error", "SSH Error"
+    else:
+        code, status, msg = 200, result.status, getattr(result, "msg", None)
+
+    return BulkServerResult(
+        server_name=name,
+        action=action,
+        status=status,
+        code=code,
+        msg=msg,
+        elapsed=round(elapsed, 3),
+    )
+
+
+@leader.singleton("idle_reaper")
+async def reap_idle_servers():
+    await CS2Service()._monitoring_server_activity()
@@ -0,0 +1,175 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from db.database import get_db_connection
+from db.leader import leader
+from services.node_service import Node, nodes
+from services.status_sync import publish_container_event
+from core.config import get_settings
+
+import asyncio
+import json
+
+
+settings = get_settings()
+
+# Событие docker -> состояние контейнера как в `docker ps` (None: контейнера нет)
+_EVENT_STATES = {
+    "start": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "die": "exited",
+    "destroy": None,
+}
+
+_EVENTS_COMMAND = (
+    "docker events --format '{{json .}}' --filter type=container"
+    + "".join(f" --filter event={event}" for event in (*_EVENT_STATES, "oom"))
+)
+
+
+class DockerEventsConsumer:
+    """Поток `docker events` с каждого хоста вместо опроса `docker ps`.
+
+    Работает у лидера: start/die/destroy/pause сразу рассылаются воркерам
+    через NOTIFY, статус сервера меняется без ожидания следующего скана.
+    Позиция в потоке (timeNano последнего события) сохраняется по хосту,
+    после обрыва SSH подписка возобновляется с `--since` и пропущенные
+    события доигрываются.
+    """
+
+    def __init__(self):
+        self._streams: Dict[int, asyncio.Task] = {}
+        self._cursors: Dict[int, int] = {}
+        self._saved: Dict[int, int] = {}
+        self._listeners: List[Callable[[Node, str, str], Awaitable]] = []
+        self._notified: Set[asyncio.Task] = set()
+        self.events = 0
+
+    def subscribe(self, listener: Callable[[Node, str, str], Awaitable]):
+        """listener(node, action, name) вызывается у лидера на каждое событие."""
+        self._listeners.append(listener)
+
+    async def run(self):
+        self._cursors.update(self._load_cursors())
+        self._saved = dict(self._cursors)
+        try:
+            while True:
+                self._sync_streams()
+                try:
+                    self.save_cursors()
+                except Exception as e:
+                    print(f"Docker events cursor save error: {e}")
+                await asyncio.sleep(settings.docker_events_cursor_interval)
+        finally:
+            for task in self._streams.values():
+                task.cancel()
+            self._streams.clear()
+
+    def save_cursors(self):
+        changed = [
+            (node_id, cursor)
+            for node_id, cursor in self._cursors.items()
+            if self._saved.get(node_id) != cursor
+        ]
+        if not changed:
+            return
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO docker_event_cursors (node_id, since_nano, updated_at)
+                    VALUES (%s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (node_id) DO UPDATE SET
+                        since_nano = EXCLUDED.since_nano,
+                        updated_at = EXCLUDED.updated_at
+                    """,
+                    changed,
+                )
+        self._saved.update(changed)
+
+    def _sync_streams(self):
+        enabled = {node.id: node for node in nodes.all() if node.enabled}
+        for node_id in list(self._streams):
+            if node_id not in enabled:
+                self._streams.pop(node_id).cancel()
+        for node_id, node in enabled.items():
+            task = self._streams.get(node_id)
+            if task is None or task.done():
+                self._streams[node_id] = asyncio.create_task(self._stream(node))
+
+    async def _stream(self, node: Node):
+        while True:
+            command = _EVENTS_COMMAND
+            cursor = self._cursors.get(node.id)
+            if cursor:
+                command += f" --since {cursor / 1e9:.9f}"
+            else:
+                # Событий до подписки нет: состояния подтянет ближайший скан
+                nodes.invalidate_states()
+
+            try:
+                async with nodes.ssh(node).create_process(command) as process:
+                    async for line in process.stdout:
+                        event = _parse_event(line)
+                        if event is None:
+                            continue
+                        await self._handle(node, *event)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Docker events stream from {node.name} failed: {e}")
+
+            await asyncio.sleep(settings.leader_retry_interval)
+
+    async def _handle(self, node: Node, time_nano: int, action: str, name: str):
+        # После --since docker повторяет событие на границе курсора
+        if time_nano <= self._cursors.get(node.id, 0):
+            return
+        self._cursors[node.id] = time_nano
+        self.events += 1
+
+        if action == "oom":
+            print(f"Container {name} on {node.name} was killed by OOM")
+            return
+
+        try:
+            await publish_container_event(name, node.id, _EVENT_STATES[action])
+        except Exception as e:
+            print(f"Couldn't publish docker event for {name}: {e}")
+
+        for listener in self._listeners:
+            task = asyncio.create_task(listener(node, action, name))
+            self._notified.add(task)
+            task.add_done_callback(self._notified.discard)
+
+    def _load_cursors(self) -> Dict[int, int]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT node_id, since_nano FROM docker_event_cursors")
+                return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def _parse_event(line: str) -> Optional[Tuple[int, str, str]]:
+    try:
+        data = json.loads(line)
+        action = data["Action"]
+        name = data["Actor"]["Attributes"]["name"]
+        time_nano = int(data.get("timeNano") or data["time"] * 1_000_000_000)
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    # Часть действий приходит с суффиксом, например "health_status: healthy"
+    action = action.split(":", 1)[0]
+    if action != "oom" and action not in _EVENT_STATES:
+        return None
+    return time_nano, action, name
+
+
+docker_events = DockerEventsConsumer()
+
+
+@leader.singleton("docker_events")
+async def consume_docker_events():
+    await docker_events.run()
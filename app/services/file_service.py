@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from services.node_service import nodes
+from core.config import get_settings
+
+from urllib.parse import quote
+
+import asyncssh
+import posixpath
+import stat
+
+
+settings = get_settings()
+
+
+class PathNotAllowed(Exception):
+    pass
+
+
+@dataclass
+class RemoteFile:
+    name: str
+    path: str
+    size: int
+    is_dir: bool
+    modified: Optional[datetime]
+
+
+class ServerFiles:
+    """Файлы тома CS2 (демки GOTV, логи, конфиги) на хосте сервера по SFTP.
+
+    Пути считаются от cs2_volume_root и не могут выйти за него, в том числе
+    через симлинки: проверяется realpath на хосте. Скачивание идёт кусками
+    sftp_chunk_size прямо в HTTP-ответ, файл целиком в памяти API не
+    держится. Поддерживается один диапазон Range.
+    """
+
+    def __init__(self, root: str, chunk_size: int):
+        self.root = posixpath.normpath(root)
+        self.chunk_size = chunk_size
+
+    async def listdir(self, server_name: str, path: str = "") -> Tuple[str, List[RemoteFile]]:
+        async with nodes.ssh_for_server(server_name).sftp() as sftp:
+            full = await self._resolve(sftp, path)
+            items = []
+            for entry in await sftp.readdir(full):
+                if entry.filename in (".", ".."):
+                    continue
+                items.append(self._file(posixpath.join(full, entry.filename), entry.attrs))
+
+        items.sort(key=lambda item: (not item.is_dir, item.name))
+        return self._relative(full), items
+
+    async def stat(self, server_name: str, path: str) -> RemoteFile:
+        async with nodes.ssh_for_server(server_name).sftp() as sftp:
+            full = await self._resolve(sftp, path)
+            return self._file(full, await sftp.stat(full))
+
+    async def read(
+        self, server_name: str, file: RemoteFile, start: int, end: int
+    ) -> AsyncIterator[bytes]:
+        """Байты [start, end] файла кусками, без буферизации целиком."""
+        async with nodes.ssh_for_server(server_name).sftp() as sftp:
+            async with sftp.open(posixpath.join(self.root, file.path), "rb") as remote:
+                offset = start
+                while offset <= end:
+                    chunk = await remote.read(min(self.chunk_size, end - offset + 1), offset)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    yield chunk
+
+    async def _resolve(self, sftp, path: str) -> str:
+        full = posixpath.normpath(posixpath.join(self.root, (path or "").lstrip("/")))
+        if not self._inside(full):
+            raise PathNotAllowed(path)
+
+        # Симлинк внутри тома может указывать наружу
+        real = await sftp.realpath(full)
+        if not self._inside(real):
+            raise PathNotAllowed(path)
+        return real
+
+    def _inside(self, path: str) -> bool:
+        return path == self.root or path.startswith(self.root + "/")
+
+    def _relative(self, path: str) -> str:
+        relative = posixpath.relpath(path, self.root)
+        return "" if relative == "." else relative
+
+    def _file(self, path: str, attrs: asyncssh.SFTPAttrs) -> RemoteFile:
+        modified = (
+            datetime.fromtimestamp(attrs.mtime, tz=timezone.utc)
+            if attrs.mtime is not None
+            else None
+        )
+        return RemoteFile(
+            name=posixpath.basename(path),
+            path=self._relative(path),
+            size=attrs.size or 0,
+            is_dir=attrs.permissions is not None and stat.S_ISDIR(attrs.permissions),
+            modified=modified,
+        )
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Один диапазон из заголовка Range: (start, end) включительно.
+
+    None: заголовка нет или он не поддерживается (несколько диапазонов,
+    другие единицы), тогда отдаётся весь файл. ValueError: диапазон вне файла.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    first, separator, last = header[len("bytes="):].strip().partition("-")
+    valid = separator and (first.isdigit() or not first) and (last.isdigit() or not last)
+    if not valid or not (first or last):
+        # Синтаксически неверный Range игнорируется (RFC 9110)
+        return None
+    if size == 0:
+        raise ValueError(header)
+
+    if not first:
+        # bytes=-N: последние N байт
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        # bytes=5-3 синтаксически неверен: игнорируется, а не 416
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def content_disposition(filename: str) -> str:
+    """Content-Disposition для скачивания по RFC 6266.
+
+    Заголовки HTTP передаются в latin-1, поэтому имя идёт в filename*
+    в UTF-8, а в filename остаётся ASCII-вариант для старых клиентов.
+    """
+    fallback = "".join(
+        char if 32 <= ord(char) < 127 and char not in '"\\' else "_" for char in filename
+    )
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+server_files = ServerFiles(root=settings.cs2_volume_root, chunk_size=settings.sftp_chunk_size)
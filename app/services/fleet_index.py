@@ -0,0 +1,154 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import base64
+import orjson
+
+
+SORT_FIELDS = ("name", "owner", "status", "map_id", "players_current")
+_INT_FIELDS = ("map_id", "players_current")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class FleetIndex:
+    """Индексы по снимку статусов для фильтрации, сортировки и пагинации.
+
+    Строится один раз на ревизию кэша; фильтры по равенству берутся из
+    индексов, порядок для каждого ключа сортировки считается лениво.
+    """
+
+    def __init__(self, statuses: List):
+        self.statuses = statuses
+        self._by_status: Dict[str, Set[int]] = defaultdict(set)
+        self._by_owner: Dict[str, Set[int]] = defaultdict(set)
+        self._by_static: Dict[bool, Set[int]] = defaultdict(set)
+        self._by_map: Dict[Optional[int], Set[int]] = defaultdict(set)
+        self._orders: Dict[str, Tuple[List[int], List[Tuple]]] = {}
+
+        for position, status in enumerate(statuses):
+            self._by_status[status.status].add(position)
+            self._by_owner[status.owner].add(position)
+            self._by_static[status.static].add(position)
+            self._by_map[status.map_id].add(position)
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        owner: Optional[str] = None,
+        static: Optional[bool] = None,
+        map_id: Optional[int] = None,
+        min_players: Optional[int] = None,
+        sort: str = "name",
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[List, int, Optional[str]]:
+        """Возвращает (страница, всего подходящих, курсор следующей страницы)."""
+        field, descending = _parse_sort(sort)
+
+        filters = []
+        if status is not None:
+            filters.append(self._by_status.get(status, set()))
+        if owner is not None:
+            filters.append(self._by_owner.get(owner, set()))
+        if static is not None:
+            filters.append(self._by_static.get(static, set()))
+        if map_id is not None:
+            filters.append(self._by_map.get(map_id, set()))
+
+        candidates = None
+        for positions in sorted(filters, key=len):
+            candidates = positions if candidates is None else candidates & positions
+
+        if min_players is not None:
+            source = range(len(self.statuses)) if candidates is None else candidates
+            candidates = {
+                position
+                for position in source
+                if (self.statuses[position].players_current or 0)
+                >= min_players
+            }
+
+        order, keys = self._order(field)
+        if candidates is not None:
+            matched = [index for index, position in enumerate(order) if position in candidates]
+        else:
+            matched = list(range(len(order)))
+
+        matched_keys = [keys[index] for index in matched]
+        if descending:
+            matched.reverse()
+            matched_keys.reverse()
+
+        start = 0
+        if cursor is not None:
+            after = _decode_cursor(cursor, field, descending)
+            if descending:
+                # Ключи идут по убыванию: ищем первый строго меньший курсора
+                start = len(matched_keys) - bisect_left(matched_keys[::-1], after)
+            else:
+                start = bisect_right(matched_keys, after)
+
+        end = len(matched) if limit is None else start + limit
+        page = [self.statuses[order[index]] for index in matched[start:end]]
+
+        next_cursor = None
+        if end < len(matched):
+            next_cursor = _encode_cursor(matched_keys[end - 1], field, descending)
+        return page, len(matched), next_cursor
+
+    def _order(self, field: str) -> Tuple[List[int], List[Tuple]]:
+        if field not in self._orders:
+            keyed = sorted(
+                (_sort_key(status, field), position)
+                for position, status in enumerate(self.statuses)
+            )
+            self._orders[field] = (
+                [position for _, position in keyed],
+                [key for key, _ in keyed],
+            )
+        return self._orders[field]
+
+
+def _parse_sort(sort: str) -> Tuple[str, bool]:
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field not in SORT_FIELDS:
+        raise ValueError(f"Unknown sort field: {field}")
+    return field, descending
+
+
+def _sort_key(status, field: str) -> Tuple:
+    value = status.server_name if field == "name" else getattr(status, field, None)
+    # None (например, map_id у выключенного сервера) всегда в конце
+    value_key = (1, "") if value is None else (0, value)
+    return (value_key, status.server_name)
+
+
+def _encode_cursor(key: Tuple, field: str, descending: bool) -> str:
+    sort = f"-{field}" if descending else field
+    return base64.urlsafe_b64encode(orjson.dumps([sort, key])).decode()
+
+
+def _decode_cursor(cursor: str, field: str, descending: bool) -> Tuple:
+    """Курсор годится только для той же сортировки: иначе ключи разных
+    типов (имя и число игроков) сравнивались бы в bisect.
+    """
+    try:
+        sort, ((flag, value), name) = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+
+    if sort != (f"-{field}" if descending else field):
+        raise InvalidCursor("Cursor was issued for a different sort")
+
+    value_type = int if field in _INT_FIELDS else str
+    valid = (flag == 1 and value == "") or (
+        flag == 0 and isinstance(value, value_type) and not isinstance(value, bool)
+    )
+    if not valid or not isinstance(name, str):
+        raise InvalidCursor("Invalid cursor")
+    return ((flag, value), name)
@@ -0,0 +1,228 @@
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Deque, List, Optional, Set, Tuple
+
+from db.database import get_db_connection
+from db.leader import leader
+from core.config import get_settings
+from models.models import *
+
+import asyncio
+import time
+
+
+settings = get_settings()
+
+RESOLUTIONS = {"1m": "server_samples_1m", "1h": "server_samples_1h"}
+
+# (server_name, ts, players, map_id, online)
+Sample = Tuple[str, datetime, int, Optional[int], bool]
+
+
+class SampleRecorder:
+    """Кольцевой буфер сэмплов онлайна, сбрасываемый в Postgres через COPY.
+
+    Пишет только лидер: сэмплы снимаются с результатов поллера статусов
+    не чаще history_sample_interval. Если БД недоступна, буфер копит
+    сэмплы до history_buffer_size и теряет самые старые.
+    """
+
+    def __init__(self, buffer_size: int, sample_interval: float):
+        self.sample_interval = sample_interval
+        self._buffer: Deque[Sample] = deque(maxlen=buffer_size)
+        self._sampled_at = 0.0
+        self._partitions: Set[date] = set()
+
+    def record(self, statuses):
+        if time.monotonic() - self._sampled_at < self.sample_interval:
+            return
+        self._sampled_at = time.monotonic()
+
+        ts = datetime.now(timezone.utc)
+        for status in statuses:
+            self._buffer.append(
+                (
+                    status.server_name,
+                    ts,
+                    status.players_current or 0,
+                    status.map_id,
+                    status.online,
+                )
+            )
+
+    def flush(self) -> int:
+        if not self._buffer:
+            return 0
+
+        batch = list(self._buffer)
+        self._buffer.clear()
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_partitions(cur, {sample[1].date() for sample in batch})
+                    with cur.copy(
+                        "COPY server_samples (server_name, ts, players, map_id, online) FROM STDIN"
+                    ) as copy:
+                        for sample in batch:
+                            copy.write_row(sample)
+        except Exception:
+            # Вернуть батч в начало буфера; при переполнении уйдут самые старые
+            self._buffer = deque(batch + list(self._buffer), maxlen=self._buffer.maxlen)
+            raise
+
+        return len(batch)
+
+    def _ensure_partitions(self, cur, days: Set[date]):
+        for day in days - self._partitions:
+            next_day = day + timedelta(days=1)
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS server_samples_p{day:%Y%m%d}
+                PARTITION OF server_samples
+                FOR VALUES FROM ('{day.isoformat()} 00:00+00') TO ('{next_day.isoformat()} 00:00+00')
+                """
+            )
+            self._partitions.add(day)
+
+
+class HistoryService:
+    """Агрегаты онлайна за минуту и час и выборки по ним."""
+
+    def rollup(self):
+        now = datetime.now(timezone.utc)
+        # Пересчитываем последние корзины целиком: upsert идемпотентен
+        lookback = timedelta(
+            seconds=max(settings.history_rollup_interval * 2, 300)
+        )
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO server_samples_1m
+                        (server_name, bucket, samples, online_samples, avg_players, max_players)
+                    SELECT
+                        server_name,
+                        date_trunc('minute', ts),
+                        COUNT(*),
+                        COUNT(*) FILTER (WHERE online),
+                        AVG(players),
+                        MAX(players)
+                    FROM server_samples
+                    WHERE ts >= date_trunc('minute', %s::timestamptz)
+                    GROUP BY 1, 2
+                    ON CONFLICT (server_name, bucket) DO UPDATE SET
+                        samples = EXCLUDED.samples,
+                        online_samples = EXCLUDED.online_samples,
+                        avg_players = EXCLUDED.avg_players,
+                        max_players = EXCLUDED.max_players
+                    """,
+                    (now - lookback,),
+                )
+                cur.execute(
+                    """
+                    INSERT INTO server_samples_1h
+                        (server_name, bucket, samples, online_samples, avg_players, max_players)
+                    SELECT
+                        server_name,
+                        date_trunc('hour', bucket),
+                        SUM(samples),
+                        SUM(online_samples),
+                        SUM(avg_players * samples) / SUM(samples),
+                        MAX(max_players)
+                    FROM server_samples_1m
+                    WHERE bucket >= date_trunc('hour', %s::timestamptz)
+                    GROUP BY 1, 2
+                    ON CONFLICT (server_name, bucket) DO UPDATE SET
+                        samples = EXCLUDED.samples,
+                        online_samples = EXCLUDED.online_samples,
+                        avg_players = EXCLUDED.avg_players,
+                        max_players = EXCLUDED.max_players
+                    """,
+                    (now - lookback,),
+                )
+
+    def prune(self):
+        today = datetime.now(timezone.utc).date()
+        raw_cutoff = today - timedelta(days=settings.history_raw_retention_days)
+        minute_cutoff = datetime.now(timezone.utc) - timedelta(
+            days=settings.history_minute_retention_days
+        )
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT child.relname
+                    FROM pg_inherits
+                    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                    WHERE parent.relname = 'server_samples'
+                    """
+                )
+                for (partition,) in cur.fetchall():
+                    try:
+                        day = datetime.strptime(partition[-8:], "%Y%m%d").date()
+                    except ValueError:
+                        continue
+                    if day < raw_cutoff:
+                        cur.execute(f"DROP TABLE IF EXISTS {partition}")
+
+                cur.execute(
+                    "DELETE FROM server_samples_1m WHERE bucket < %s", (minute_cutoff,)
+                )
+
+    def history(
+        self, server_name: str, start: datetime, end: datetime, resolution: str
+    ) -> List[HistoryPoint]:
+        table = RESOLUTIONS[resolution]
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT bucket, samples, online_samples, avg_players, max_players
+                    FROM {table}
+                    WHERE server_name = %s AND bucket >= %s AND bucket < %s
+                    ORDER BY bucket
+                    """,
+                    (server_name, start, end),
+                )
+                rows = cur.fetchall()
+
+        return [
+            HistoryPoint(
+                ts=bucket,
+                avg_players=round(avg_players, 2),
+                max_players=max_players,
+                online_ratio=round(online_samples / samples, 3) if samples else 0.0,
+            )
+            for bucket, samples, online_samples, avg_players, max_players in rows
+        ]
+
+
+sample_recorder = SampleRecorder(
+    buffer_size=settings.history_buffer_size,
+    sample_interval=settings.history_sample_interval,
+)
+history_service = HistoryService()
+
+
+@leader.singleton("history_flusher")
+async def flush_samples():
+    while True:
+        await asyncio.sleep(settings.history_flush_interval)
+        try:
+            sample_recorder.flush()
+        except Exception as e:
+            print(f"History flush error: {e}")
+
+
+@leader.singleton("history_rollup")
+async def rollup_samples():
+    while True:
+        await asyncio.sleep(settings.history_rollup_interval)
+        try:
+            history_service.rollup()
+            history_service.prune()
+        except Exception as e:
+            print(f"History rollup error: {e}")
@@ -0,0 +1,191 @@
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Pattern, Set, Tuple
+
+from services.node_service import nodes
+from services.ssh_service import SSHManager
+from core.config import get_settings
+
+import asyncio
+import shlex
+
+
+settings = get_settings()
+
+
+class _Viewer:
+    def __init__(self, pattern: Optional[Pattern], tail: int, buffer_size: int):
+        self.pattern = pattern
+        self.tail = tail
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+
+    def wants(self, line: str) -> bool:
+        return self.pattern is None or self.pattern.search(line) is not None
+
+    def push(self, line: str):
+        try:
+            self.queue.put_nowait(line)
+        except asyncio.QueueFull:
+            # Медленный клиент: строки теряются у него, а не копятся в памяти
+            self.dropped += 1
+
+
+class _LogSession:
+    """Один `docker logs -f` на сервер, общий для всех зрителей.
+
+    Хвост истории читается отдельным `docker logs --tail` и раздаётся
+    каждому зрителю по его tail, в общий поток попадают только новые строки.
+    Строки идут с метками времени (-t): после обрыва поток продолжается
+    с метки последней строки, без потерь и повторов.
+    """
+
+    def __init__(self, server_name: str, history_size: int):
+        self.server_name = server_name
+        self.viewers: Set[_Viewer] = set()
+        self.history: Deque[str] = deque(maxlen=history_size)
+        self.task: Optional[asyncio.Task] = None
+        self.last_stamp = ""
+
+    async def run(self):
+        name = shlex.quote(self.server_name)
+        since = None
+        while True:
+            try:
+                # Хост сервера ищется заново: после обрыва соединение переоткрывается
+                ssh = nodes.ssh_for_server(self.server_name)
+                if since is None:
+                    since = await self._prefill(ssh, name)
+
+                command = f"docker logs -f -t --since {since} {name} 2>&1"
+                async with ssh.create_process(command, errors="replace") as process:
+                    async for line in process.stdout:
+                        stamp, text = _split_stamp(line.rstrip("\n"))
+                        if stamp is not None:
+                            # --since включает границу: строки до метки уже были
+                            if stamp <= self.last_stamp:
+                                continue
+                            self.last_stamp = since = stamp
+                        self.publish(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Log stream of {self.server_name} failed: {e}")
+
+            # Контейнер остановлен или SSH оборвался: продолжаем с метки последней строки
+            await asyncio.sleep(settings.log_stream_retry_interval)
+
+    async def _prefill(self, ssh: SSHManager, name: str) -> str:
+        # Время хоста до чтения хвоста: строки после него придут в потоке
+        command = (
+            f"date -u +%Y-%m-%dT%H:%M:%S.%NZ;"
+            f" docker logs -t --tail {self.history.maxlen} {name} 2>&1"
+        )
+        result = await ssh.run(command)
+        lines = result.stdout.splitlines()
+        cutoff = lines[0].strip() if lines else ""
+        if not cutoff:
+            raise RuntimeError(result.stderr.strip() or "no host time")
+
+        for line in lines[1:]:
+            stamp, text = _split_stamp(line)
+            if stamp is not None:
+                self.last_stamp = stamp
+            self.history.append(text)
+
+        # Зрители, пришедшие до заполнения истории, получают свой хвост сейчас
+        for viewer in self.viewers:
+            self.replay(viewer)
+        return self.last_stamp or cutoff
+
+    def replay(self, viewer: _Viewer):
+        matching = [line for line in self.history if viewer.wants(line)]
+        for line in matching[-viewer.tail:] if viewer.tail > 0 else ():
+            viewer.push(line)
+
+    def publish(self, line: str):
+        self.history.append(line)
+        for viewer in self.viewers:
+            if viewer.wants(line):
+                viewer.push(line)
+
+
+def _split_stamp(line: str) -> Tuple[Optional[str], str]:
+    """Метка времени `docker logs -t` и текст строки.
+
+    Метки RFC3339 с фиксированной длиной в UTC, их можно сравнивать
+    как строки. Сообщения самого docker (нет контейнера) идут без метки.
+    """
+    stamp, separator, text = line.partition(" ")
+    if separator and stamp[:1].isdigit() and "T" in stamp:
+        return stamp, text
+    return None, line
+
+
+class LogStreams:
+    """Хвост логов контейнеров для админов по WebSocket.
+
+    На сервер держится один поток `docker logs -f` по постоянному
+    SSH-соединению его хоста, строки раздаются всем зрителям. У каждого
+    зрителя своя ограниченная очередь и свой фильтр (регулярное выражение),
+    отправка пачками. Последние строки хранятся в кольцевом буфере, новый
+    зритель сразу получает хвост. Когда уходит последний зритель, поток
+    закрывается.
+    """
+
+    def __init__(self, history_size: int, buffer_size: int):
+        self.history_size = history_size
+        self.buffer_size = buffer_size
+        self._sessions: Dict[str, _LogSession] = {}
+
+    def subscribe(
+        self, server_name: str, tail: int, pattern: Optional[Pattern] = None
+    ) -> _Viewer:
+        session = self._sessions.get(server_name)
+        if session is None:
+            session = self._sessions[server_name] = _LogSession(server_name, self.history_size)
+            session.task = asyncio.create_task(session.run())
+
+        viewer = _Viewer(pattern, tail, self.buffer_size)
+        session.replay(viewer)
+        session.viewers.add(viewer)
+        return viewer
+
+    def unsubscribe(self, server_name: str, viewer: _Viewer):
+        session = self._sessions.get(server_name)
+        if session is None:
+            return
+        session.viewers.discard(viewer)
+        if not session.viewers:
+            session.task.cancel()
+            del self._sessions[server_name]
+
+    async def batches(self, viewer: _Viewer) -> AsyncIterator[Optional[Dict]]:
+        """Пачки строк; None означает, что пора отправить keepalive."""
+        while True:
+            try:
+                first = await asyncio.wait_for(
+                    viewer.queue.get(), timeout=settings.status_stream_keepalive
+                )
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            # Короткое окно, чтобы отправить одну пачку вместо сотни сообщений
+            await asyncio.sleep(settings.log_batch_window)
+            lines: List[str] = [first]
+            while len(lines) < settings.log_batch_max and not viewer.queue.empty():
+                lines.append(viewer.queue.get_nowait())
+
+            message = {"type": "lines", "lines": lines}
+            if viewer.dropped:
+                message["dropped"] = viewer.dropped
+                viewer.dropped = 0
+            yield message
+
+    def metrics(self) -> Dict[str, int]:
+        return {name: len(session.viewers) for name, session in self._sessions.items()}
+
+
+log_streams = LogStreams(
+    history_size=settings.log_stream_history, buffer_size=settings.log_stream_buffer
+)
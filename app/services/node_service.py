@@ -0,0 +1,228 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from db.database import get_db_connection
+from core.single_flight import SingleFlight
+from services.ssh_service import SSHManager
+from services.container_service import ContainerStateCache
+from core.config import get_settings
+
+import asyncio
+import time
+
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class Node:
+    id: int
+    name: str
+    ssh_host: str
+    ssh_port: int
+    ssh_user: str
+    public_ip: str
+    port_min: Optional[int] = None
+    port_max: Optional[int] = None
+    max_servers: Optional[int] = None
+    enabled: bool = True
+
+
+@dataclass
+class NodeLoad:
+    cpus: int
+    load1: float
+    mem_total: int
+    mem_available: int
+
+    @property
+    def cpu_headroom(self) -> float:
+        return max(0.0, 1.0 - self.load1 / max(self.cpus, 1))
+
+    @property
+    def mem_headroom(self) -> float:
+        return self.mem_available / self.mem_total if self.mem_total else 0.0
+
+
+class NodeRegistry:
+    """Docker-хосты из таблицы nodes: SSH-соединение и кэш состояний
+    контейнеров на каждый хост, плюс нагрузка хоста для размещения.
+    """
+
+    def __init__(self, ttl: float, load_ttl: float):
+        self.ttl = ttl
+        self.load_ttl = load_ttl
+        self._nodes: Dict[int, Node] = {}
+        self._loaded_at = 0.0
+        self._ssh: Dict[int, Tuple[Node, SSHManager]] = {}
+        self._states: Dict[int, ContainerStateCache] = {}
+        self._loads: Dict[int, Tuple[float, Optional[NodeLoad]]] = {}
+        self._flight = SingleFlight()
+
+    def all(self) -> List[Node]:
+        if time.monotonic() - self._loaded_at > self.ttl:
+            self._nodes = {node.id: node for node in self._fetch_nodes()}
+            self._loaded_at = time.monotonic()
+        return list(self._nodes.values())
+
+    def get(self, node_id: Optional[int]) -> Node:
+        self.all()
+        if node_id is None or node_id not in self._nodes:
+            return self.default()
+        return self._nodes[node_id]
+
+    def default(self) -> Node:
+        for node in self.all():
+            if node.name == settings.default_node_name:
+                return node
+        raise LookupError("Default node is not registered")
+
+    def node_for_server(self, server_name: str) -> Node:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT node_id FROM servers WHERE name = %s", (server_name,))
+                row = cur.fetchone()
+        return self.get(row[0] if row else None)
+
+    def ssh(self, node: Node) -> SSHManager:
+        entry = self._ssh.get(node.id)
+        # Параметры хоста поменялись в таблице: старое соединение не годится
+        if entry is None or entry[0] != node:
+            manager = SSHManager(node.ssh_host, node.ssh_user, port=node.ssh_port)
+            self._ssh[node.id] = (node, manager)
+            self._states[node.id] = ContainerStateCache(
+                manager, ttl=settings.container_state_ttl
+            )
+        return self._ssh[node.id][1]
+
+    def ssh_for_server(self, server_name: str) -> SSHManager:
+        return self.ssh(self.node_for_server(server_name))
+
+    def states(self, node: Node) -> ContainerStateCache:
+        self.ssh(node)
+        return self._states[node.id]
+
+    async def container_states(self) -> Dict[int, Optional[Dict[str, str]]]:
+        """Состояния контейнеров по хостам; None для недоступного хоста."""
+        nodes = [node for node in self.all() if node.enabled]
+
+        async def load(node):
+            try:
+                return await self.states(node).all()
+            except Exception as e:
+                print(f"Couldn't load container states from {node.name}: {e}")
+                return None
+
+        results = await asyncio.gather(*(load(node) for node in nodes))
+        return {node.id: states for node, states in zip(nodes, results)}
+
+    def invalidate_states(self):
+        for cache in self._states.values():
+            cache.invalidate()
+
+    def apply_container_state(self, node_id: int, name: str, state: Optional[str]):
+        cache = self._states.get(node_id)
+        if cache is not None:
+            cache.apply(name, state)
+
+    async def load(self, node: Node) -> Optional[NodeLoad]:
+        cached = self._loads.get(node.id)
+        if cached is not None and time.monotonic() - cached[0] <= self.load_ttl:
+            return cached[1]
+        return await self._flight.do(("load", node.id), lambda: self._load(node))
+
+    async def close(self):
+        for _, manager in self._ssh.values():
+            await manager.close()
+        self._ssh.clear()
+        self._states.clear()
+
+    def register(
+        self,
+        name: str,
+        ssh_host: str,
+        ssh_user: str,
+        public_ip: str,
+        ssh_port: int = 22,
+        port_min: Optional[int] = None,
+        port_max: Optional[int] = None,
+        max_servers: Optional[int] = None,
+        enabled: bool = True,
+    ) -> Node:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO nodes
+                        (name, ssh_host, ssh_port, ssh_user, public_ip, port_min, port_max, max_servers, enabled)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (name) DO UPDATE SET
+                        ssh_host = EXCLUDED.ssh_host,
+                        ssh_port = EXCLUDED.ssh_port,
+                        ssh_user = EXCLUDED.ssh_user,
+                        public_ip = EXCLUDED.public_ip,
+                        port_min = EXCLUDED.port_min,
+                        port_max = EXCLUDED.port_max,
+                        max_servers = EXCLUDED.max_servers,
+                        enabled = EXCLUDED.enabled
+                    RETURNING id
+                    """,
+                    (name, ssh_host, ssh_port, ssh_user, public_ip, port_min, port_max, max_servers, enabled),
+                )
+                node_id = cur.fetchone()[0]
+
+        self._loaded_at = 0.0
+        return self.get(node_id)
+
+    def capacity(self) -> Dict[int, Tuple[int, int]]:
+        """{node_id: (свободных портов, серверов)}."""
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT
+                        nodes.id,
+                        (SELECT COUNT(*) FROM ports
+                            WHERE ports.node_id = nodes.id AND ports.is_occupied = FALSE),
+                        (SELECT COUNT(*) FROM servers WHERE servers.node_id = nodes.id)
+                    FROM nodes
+                    """
+                )
+                return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+
+    async def _load(self, node: Node) -> Optional[NodeLoad]:
+        try:
+            result = await self.ssh(node).run(
+                "nproc && cat /proc/loadavg && grep -E '^(MemTotal|MemAvailable):' /proc/meminfo"
+            )
+            lines = result.stdout.splitlines()
+            memory = {line.split(":")[0]: int(line.split()[1]) * 1024 for line in lines[2:4]}
+            load = NodeLoad(
+                cpus=int(lines[0]),
+                load1=float(lines[1].split()[0]),
+                mem_total=memory["MemTotal"],
+                mem_available=memory["MemAvailable"],
+            )
+        except Exception as e:
+            print(f"Couldn't load node {node.name} load: {e}")
+            load = None
+
+        self._loads[node.id] = (time.monotonic(), load)
+        return load
+
+    def _fetch_nodes(self) -> List[Node]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT id, name, ssh_host, ssh_port, ssh_user, public_ip,
+                        port_min, port_max, max_servers, enabled
+                    FROM nodes ORDER BY id
+                    """
+                )
+                rows = cur.fetchall()
+                columns = [desc[0] for desc in cur.description]
+                return [Node(**dict(zip(columns, row))) for row in rows]
+
+
+nodes = NodeRegistry(ttl=settings.node_cache_ttl, load_ttl=settings.node_load_ttl)
@@ -0,0 +1,280 @@
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from psycopg.types.json import Jsonb
+
+from db.database import get_db_connection, get_conninfo
+from db.leader import leader
+from core.single_flight import SingleFlight
+from core.config import get_settings
+from models.models import ErrorResponse
+
+import asyncio
+import hashlib
+import json
+import psycopg
+
+
+settings = get_settings()
+
+# Заголовки ответа, которые нужно повторить при выдаче сохранённого результата
+_REPLAY_HEADERS = ("retry-after",)
+
+
+class OperationBusy(Exception):
+    pass
+
+
+@dataclass
+class OperationResult:
+    status_code: int
+    body: Dict
+    headers: Dict[str, str] = field(default_factory=dict)
+    replayed: bool = False
+
+    @classmethod
+    def from_response(cls, result) -> "OperationResult":
+        if isinstance(result, Response):
+            headers = {
+                key: value
+                for key, value in result.headers.items()
+                if key.lower() in _REPLAY_HEADERS
+            }
+            return cls(result.status_code, json.loads(result.body), headers)
+        if not result:
+            return cls(500, jsonable_encoder(ErrorResponse(status="error", msg="SSH Error")))
+        return cls(200, jsonable_encoder(result))
+
+    @property
+    def storable(self) -> bool:
+        # Таймауты и ошибки хоста временные: повтор с тем же ключом должен выполниться
+        return self.status_code < 500 and self.status_code != 408
+
+    def response(self) -> JSONResponse:
+        headers = dict(self.headers)
+        if self.replayed:
+            headers["Idempotent-Replayed"] = "true"
+        return JSONResponse(status_code=self.status_code, content=self.body, headers=headers)
+
+
+class ServerOperations:
+    """Сериализация start/stop/create/delete одного сервера между воркерами.
+
+    Одинаковые одновременные запросы в воркере склеиваются в одно
+    выполнение (SingleFlight), разные операции над сервером идут по очереди
+    под pg_advisory_lock на отдельном соединении, так что два воркера не
+    запускают docker start и docker stop одного контейнера одновременно.
+
+    С заголовком Idempotency-Key результат сохраняется в idempotency_keys,
+    и повтор запроса с тем же ключом возвращает его без выполнения.
+    Проверка ключа повторяется под блокировкой: повтор, пришедший в другой
+    воркер во время выполнения, дождётся блокировки и получит сохранённый ответ.
+    """
+
+    def __init__(self, namespace: int, lock_timeout: float):
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self._flight = SingleFlight()
+        self._local: Dict[str, asyncio.Lock] = {}
+        self._waiting: Dict[str, int] = {}
+        self.replayed = 0
+        self.busy = 0
+
+    async def run(
+        self,
+        operation: str,
+        server_name: str,
+        func: Callable[[], Awaitable],
+        idempotency_key: Optional[str] = None,
+        fingerprint: str = "",
+    ) -> JSONResponse:
+        request_hash = hashlib.sha256(
+            f"{operation}\0{server_name}\0{fingerprint}".encode()
+        ).hexdigest()
+
+        if idempotency_key:
+            stored = await asyncio.to_thread(self._lookup, idempotency_key, request_hash)
+            if stored is not None:
+                return stored.response()
+
+        key = (operation, server_name, request_hash)
+        try:
+            result = await self._flight.do(
+                key,
+                lambda: self._locked(
+                    operation, server_name, func, idempotency_key, request_hash
+                ),
+            )
+        except OperationBusy:
+            self.busy += 1
+            error_response = jsonable_encoder(
+                ErrorResponse(
+                    status="failed",
+                    msg="Another operation on this server is in progress",
+                )
+            )
+            return JSONResponse(status_code=409, content=error_response)
+        finally:
+            self._flight.forget(key)
+
+        # Подключившийся к чужому выполнению запрос сохраняет результат под своим ключом
+        if idempotency_key and not result.replayed and result.storable:
+            await asyncio.to_thread(
+                self._store, idempotency_key, operation, server_name, request_hash, result
+            )
+        return result.response()
+
+    def metrics(self) -> Dict:
+        return {
+            **self._flight.metrics.as_dict(),
+            "replayed": self.replayed,
+            "busy": self.busy,
+        }
+
+    async def _locked(
+        self,
+        operation: str,
+        server_name: str,
+        func: Callable[[], Awaitable],
+        idempotency_key: Optional[str],
+        request_hash: str,
+    ) -> OperationResult:
+        local = self._local.setdefault(server_name, asyncio.Lock())
+        self._waiting[server_name] = self._waiting.get(server_name, 0) + 1
+        try:
+            async with local:
+                async with await psycopg.AsyncConnection.connect(
+                    get_conninfo(), autocommit=True
+                ) as conn:
+                    await self._acquire(conn, server_name)
+
+                    if idempotency_key:
+                        stored = await asyncio.to_thread(
+                            self._lookup, idempotency_key, request_hash
+                        )
+                        if stored is not None:
+                            return stored
+
+                    result = OperationResult.from_response(await func())
+                    if idempotency_key and result.storable:
+                        await asyncio.to_thread(
+                            self._store,
+                            idempotency_key,
+                            operation,
+                            server_name,
+                            request_hash,
+                            result,
+                        )
+                    # Блокировка снимается закрытием соединения
+                    return result
+        finally:
+            self._waiting[server_name] -= 1
+            if not self._waiting[server_name]:
+                del self._waiting[server_name]
+                del self._local[server_name]
+
+    async def _acquire(self, conn, server_name: str):
+        await conn.execute(
+            "SELECT set_config('lock_timeout', %s, false)",
+            (f"{int(self.lock_timeout * 1000)}ms",),
+        )
+        try:
+            await conn.execute(
+                "SELECT pg_advisory_lock(%s::int, hashtext(%s))", (self.namespace, server_name)
+            )
+        except psycopg.errors.LockNotAvailable:
+            raise OperationBusy()
+
+    def _lookup(self, idempotency_key: str, request_hash: str) -> Optional[OperationResult]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT request_hash, status_code, response, headers FROM idempotency_keys
+                    WHERE key = %s
+                      AND created_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    """,
+                    (idempotency_key, settings.idempotency_key_ttl),
+                )
+                row = cur.fetchone()
+
+        if row is None:
+            return None
+
+        self.replayed += 1
+        if row[0] != request_hash:
+            error_response = jsonable_encoder(
+                ErrorResponse(
+                    status="failed",
+                    msg="Idempotency-Key was already used for a different request",
+                )
+            )
+            return OperationResult(422, error_response, replayed=True)
+        return OperationResult(row[1], row[2], row[3] or {}, replayed=True)
+
+    def _store(
+        self,
+        idempotency_key: str,
+        operation: str,
+        server_name: str,
+        request_hash: str,
+        result: OperationResult,
+    ):
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO idempotency_keys
+                        (key, operation, server_name, request_hash, status_code, response, headers)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (key) DO UPDATE SET
+                        operation = EXCLUDED.operation,
+                        server_name = EXCLUDED.server_name,
+                        request_hash = EXCLUDED.request_hash,
+                        status_code = EXCLUDED.status_code,
+                        response = EXCLUDED.response,
+                        headers = EXCLUDED.headers,
+                        created_at = CURRENT_TIMESTAMP
+                    WHERE idempotency_keys.created_at
+                        <= CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    """,
+                    (
+                        idempotency_key,
+                        operation,
+                        server_name,
+                        request_hash,
+                        result.status_code,
+                        Jsonb(result.body),
+                        Jsonb(result.headers),
+                        settings.idempotency_key_ttl,
+                    ),
+                )
+
+    def prune(self) -> int:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    DELETE FROM idempotency_keys
+                    WHERE created_at <= CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    """,
+                    (settings.idempotency_key_ttl,),
+                )
+                return cur.rowcount
+
+
+server_operations = ServerOperations(
+    namespace=settings.server_lock_namespace, lock_timeout=settings.server_lock_timeout
+)
+
+
+@leader.singleton("idempotency_prune")
+async def prune_idempotency_keys():
+    while True:
+        await asyncio.sleep(3600)
+        try:
+            server_operations.prune()
+        except Exception as e:
+            print(f"Idempotency keys prune error: {e}")
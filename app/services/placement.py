@@ -0,0 +1,79 @@
+from typing import Optional, Tuple
+
+from services.node_service import Node, NodeRegistry, nodes
+from services.telemetry_service import TelemetryReader, telemetry_reader
+from core.config import get_settings
+
+import asyncio
+
+
+settings = get_settings()
+
+
+class NoCapacity(Exception):
+    def __init__(self, msg: str, saturated: bool = False):
+        super().__init__(msg)
+        self.msg = msg
+        # True: порты есть, но хосты перегружены, имеет смысл повторить позже
+        self.saturated = saturated
+
+
+class PlacementScheduler:
+    """Выбор хоста для нового контейнера и допуск по ресурсам.
+
+    Кандидаты: включённые, доступные по SSH, со свободным портом и ниже
+    max_servers. Нагрузка берётся из телеметрии docker stats (node_metrics),
+    а если она устарела — из loadavg/meminfo хоста. Хосты выше порогов
+    admission_max_cpu / admission_max_mem не принимают новые серверы.
+    Из оставшихся берётся хост с наибольшим запасом по худшему из
+    CPU/памяти, при равенстве — с меньшим числом серверов.
+    """
+
+    def __init__(self, nodes: NodeRegistry, telemetry: TelemetryReader):
+        self.nodes = nodes
+        self.telemetry = telemetry
+
+    async def choose(self, exclude: Tuple[int, ...] = ()) -> Node:
+        candidates = [
+            node for node in self.nodes.all() if node.enabled and node.id not in exclude
+        ]
+        capacity = self.nodes.capacity()
+        hosts = self.telemetry.fresh_hosts()
+        usages = await asyncio.gather(*(self._usage(node, hosts) for node in candidates))
+
+        best, best_key = None, None
+        saturated = False
+        for node, usage in zip(candidates, usages):
+            free_ports, servers = capacity.get(node.id, (0, 0))
+            if usage is None or free_ports == 0:
+                continue
+            if node.max_servers is not None and servers >= node.max_servers:
+                continue
+
+            cpu_used, mem_used = usage
+            if cpu_used > settings.admission_max_cpu or mem_used > settings.admission_max_mem:
+                saturated = True
+                continue
+
+            key = (min(1.0 - cpu_used, 1.0 - mem_used), -servers, free_ports)
+            if best_key is None or key > best_key:
+                best, best_key = node, key
+
+        if best is None:
+            if saturated:
+                raise NoCapacity("All nodes are above resource thresholds", saturated=True)
+            raise NoCapacity("No node with free capacity")
+        return best
+
+    async def _usage(self, node: Node, hosts) -> Optional[Tuple[float, float]]:
+        host = hosts.get(node.id)
+        if host is not None:
+            return host.cpu_used, host.mem_used
+
+        load = await self.nodes.load(node)
+        if load is None:
+            return None
+        return 1.0 - load.cpu_headroom, 1.0 - load.mem_headroom
+
+
+placement = PlacementScheduler(nodes, telemetry_reader)
@@ -51,3 +51,44 @@ class PortManager:
                 )
 
                 return cur.rowcount > 0
+
+    def reserve(self, cur, node_id: int, container_name: str):
+        """Занять свободный порт хоста в транзакции вызывающего (курсор cur)."""
+        cur.execute(
+            """
+            SELECT port FROM ports WHERE node_id = %s AND is_occupied = FALSE
+            ORDER BY port LIMIT 1 FOR UPDATE SKIP LOCKED
+            """,
+            (node_id,),
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+
+        cur.execute(
+            "UPDATE ports SET is_occupied = TRUE, container_name = %s, occupied_at = CURRENT_TIMESTAMP WHERE node_id = %s AND port = %s",
+            (container_name, node_id, row[0]),
+        )
+        return row[0]
+
+    def release(self, cur, node_id: int, port: int):
+        cur.execute(
+            "UPDATE ports SET is_occupied = FALSE, container_name = NULL, occupied_at = NULL WHERE node_id = %s AND port = %s",
+            (node_id, port),
+        )
+
+    def seed_range(self, node_id: int, port_min: int, port_max: int):
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO ports (port, node_id)
+                    SELECT candidate, %s FROM generate_series(%s, %s) AS candidate
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM ports WHERE node_id = %s AND port = candidate
+                    )
+                    """,
+                    (node_id, port_min, port_max, node_id),
+                )
+
+                return cur.rowcount
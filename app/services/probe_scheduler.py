@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import time
+
+
+@dataclass
+class _Cadence:
+    interval: float
+    next_due: float = 0.0
+    fingerprint: Optional[dict] = None
+
+
+class ProbeScheduler:
+    """Адаптивная частота A2S-опроса для каждого сервера.
+
+    Серверы с игроками и серверы, у которых что-то изменилось, опрашиваются
+    с минимальным интервалом. Пустые и выключенные серверы без изменений
+    опрашиваются всё реже (экспоненциально до max_interval). События
+    жизненного цикла (start/stop/create) сбрасывают интервал сразу.
+    Общее число проб ограничено токен-бакетом max_per_second.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        backoff_factor: float,
+        max_per_second: float,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.max_per_second = max_per_second
+        self._cadences: Dict[str, _Cadence] = {}
+        self._burst = max(1.0, max_per_second * min_interval)
+        self._tokens = self._burst
+        self._refilled_at = time.monotonic()
+
+    def due(self, names: Iterable[str]) -> List[str]:
+        now = time.monotonic()
+        self._refill(now)
+
+        overdue = []
+        for name in names:
+            cadence = self._cadences.get(name)
+            if cadence is None or cadence.next_due <= now:
+                overdue.append((cadence.next_due if cadence else 0.0, name))
+
+        overdue.sort()
+        allowed = int(self._tokens)
+        self._tokens -= min(allowed, len(overdue))
+        return [name for _, name in overdue[:allowed]]
+
+    def record(self, name: str, status):
+        fingerprint = status.model_dump()
+        cadence = self._cadences.get(name)
+        if cadence is None:
+            cadence = self._cadences[name] = _Cadence(interval=self.min_interval)
+
+        active = (status.players_current or 0) > 0
+        if active or fingerprint != cadence.fingerprint:
+            cadence.interval = self.min_interval
+        else:
+            cadence.interval = min(
+                cadence.interval * self.backoff_factor, self.max_interval
+            )
+
+        cadence.fingerprint = fingerprint
+        cadence.next_due = time.monotonic() + cadence.interval
+
+    def reset(self, name: str):
+        cadence = self._cadences.get(name)
+        if cadence is not None:
+            cadence.interval = self.min_interval
+            cadence.next_due = 0.0
+
+    def retain(self, names: Iterable[str]):
+        keep = set(names)
+        for name in list(self._cadences):
+            if name not in keep:
+                del self._cadences[name]
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._tokens = min(self._burst, self._tokens + elapsed * self.max_per_second)
@@ -0,0 +1,378 @@
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from services.steam_service import SteamService
+from services.server_registry import server_registry
+from services.node_service import Node, nodes
+from services.placement import NoCapacity, placement
+from services.port_service import PortManager
+from services.status_sync import publish_lifecycle_event
+from services.artifact_service import CONTAINER_MAPS_DIR, artifact_cache
+from db.database import get_db_connection
+from core.config import get_settings
+from models.models import *
+
+import asyncio
+import time
+
+
+settings = get_settings()
+steam = SteamService()
+docker_port = PortManager()
+
+
+class ProvisioningError(Exception):
+    def __init__(
+        self,
+        status_code: int,
+        msg: str,
+        status: str = "failed",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        super().__init__(msg)
+        self.status_code = status_code
+        self.status = status
+        self.msg = msg
+        self.headers = headers
+
+
+@dataclass
+class Step:
+    name: str
+    run: Callable[[Any], Awaitable[None]]
+    undo: Optional[Callable[[Any], Awaitable[None]]] = None
+    after: Tuple[str, ...] = ()
+
+
+@dataclass
+class StepStats:
+    runs: int = 0
+    failures: int = 0
+    compensations: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "compensations": self.compensations,
+            "avg_seconds": round(self.total_seconds / self.runs, 3) if self.runs else 0.0,
+            "max_seconds": round(self.max_seconds, 3),
+            "last_seconds": round(self.last_seconds, 3),
+        }
+
+
+class Saga:
+    """Граф шагов с компенсациями.
+
+    Шаг запускается, как только завершились все шаги из его after, не
+    дожидаясь остальных шагов того же уровня. Если какой-то шаг упал, новые
+    шаги не запускаются, дожидаемся уже запущенных и откатываем выполненные
+    шаги в порядке, обратном завершению.
+    """
+
+    def __init__(self, name: str, steps: List[Step]):
+        self.name = name
+        self.steps = steps
+        # Проверка графа: циклы и неизвестные зависимости видны сразу
+        self._layers(steps)
+        self.stats: Dict[str, StepStats] = {step.name: StepStats() for step in steps}
+
+    async def run(self, context) -> Dict[str, float]:
+        timings: Dict[str, float] = {}
+        completed: List[Step] = []
+        done = set()
+        pending = list(self.steps)
+        running: Dict[asyncio.Task, Step] = {}
+        failure = None
+
+        try:
+            while pending or running:
+                if failure is None:
+                    ready = [step for step in pending if all(dep in done for dep in step.after)]
+                    for step in ready:
+                        pending.remove(step)
+                        task = asyncio.create_task(self._run_step(step, context, timings))
+                        running[task] = step
+                if not running:
+                    break
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    step = running.pop(task)
+                    if task.exception() is not None:
+                        failure = failure or task.exception()
+                    else:
+                        done.add(step.name)
+                        completed.append(step)
+        except asyncio.CancelledError:
+            # Отменили саму сагу: запущенные шаги тоже отменяются и откатываются
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            for task, step in running.items():
+                if not task.cancelled() and task.exception() is None:
+                    completed.append(step)
+            await self._compensate(completed, context)
+            raise
+
+        if failure is not None:
+            await self._compensate(completed, context)
+            if isinstance(failure, ProvisioningError):
+                raise failure
+            raise ProvisioningError(500, f"Provisioning failed: {failure}", "error")
+
+        return timings
+
+    async def _run_step(self, step: Step, context, timings: Dict[str, float]):
+        stats = self.stats[step.name]
+        started = time.perf_counter()
+        try:
+            await step.run(context)
+        except BaseException:
+            stats.failures += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            timings[step.name] = elapsed
+            stats.runs += 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            stats.last_seconds = elapsed
+
+    async def _compensate(self, completed: List[Step], context):
+        for step in reversed(completed):
+            if step.undo is None:
+                continue
+            try:
+                await step.undo(context)
+                self.stats[step.name].compensations += 1
+            except Exception as e:
+                print(f"{self.name}: undo of {step.name} failed: {e}")
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    @staticmethod
+    def _layers(steps: List[Step]) -> List[List[Step]]:
+        pending = {step.name: step for step in steps}
+        done = set()
+        layers = []
+        while pending:
+            layer = [
+                step for step in pending.values() if all(dep in done for dep in step.after)
+            ]
+            if not layer:
+                raise ValueError(f"Cyclic or unknown step dependencies: {list(pending)}")
+            layers.append(layer)
+            for step in layer:
+                done.add(step.name)
+                del pending[step.name]
+        return layers
+
+
+async def ensure_name_free(server_name: str):
+    def exists():
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM servers WHERE name = %s", (server_name,))
+                return cur.fetchone() is not None
+
+    if await asyncio.to_thread(exists):
+        raise ProvisioningError(409, "Server name already exists")
+
+
+def docker_run_command(
+    name: str, srcd_token: str, password: str, port: int, config_staged: bool = False
+) -> str:
+    # Бандл конфигов уже распакован в томе игры на хосте: не качаем его при загрузке
+    config_url = "" if config_staged else settings.cs2_config_url
+    return f"""docker run -dit --name={name} \
+    -e SRCDS_TOKEN="{srcd_token}" \
+    -e CS2_CFG_URL="{config_url}" \
+    -e CS2_RCONPW="{settings.rcon_password}" \
+    -e CS2_PW="{password}" \
+    -v {settings.cs2_volume_root}:/home/steam/cs2-dedicated \
+    -v {settings.artifact_root}/maps:{CONTAINER_MAPS_DIR}:ro \
+    -p {port}:27015/tcp -p {port}:27015/udp \
+    joedwards32/cs2"""
+
+
+async def place_node() -> Node:
+    try:
+        return await placement.choose()
+    except NoCapacity as e:
+        # Хосты перегружены: клиенту стоит повторить позже
+        headers = {"Retry-After": str(settings.admission_retry_after)} if e.saturated else None
+        raise ProvisioningError(503, e.msg, headers=headers)
+
+
+@dataclass
+class CreateContext:
+    request: CreateServerRequest
+    owner: str
+    port: Optional[int] = None
+    server_steamid: Optional[str] = None
+    srcd_token: Optional[str] = None
+    server: Any = None
+    node: Optional[Node] = None
+    container: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class ServerProvisioner:
+    """Создание сервера: проверка имени, затем токен Steam параллельно с
+    выбором хоста и резервированием порта и строки в БД, затем docker run
+    на выбранном хосте и ожидание A2S.
+    """
+
+    def __init__(self):
+        self.create_saga = Saga(
+            "create_server",
+            [
+                Step("check_name", self._check_name),
+                Step("steam_token", self._steam_token, self._return_token, after=("check_name",)),
+                Step("place", self._place, after=("check_name",)),
+                Step("reserve", self._reserve, self._release, after=("place",)),
+                Step("attach_token", self._attach_token, after=("steam_token", "reserve")),
+                Step("docker_run", self._docker_run, self._remove_container, after=("attach_token",)),
+                Step("wait_online", self._wait_online, after=("docker_run",)),
+            ],
+        )
+
+    async def create(self, request: CreateServerRequest, owner: str) -> CreateContext:
+        context = CreateContext(request=request, owner=owner)
+        started = time.perf_counter()
+        try:
+            context.timings = await self.create_saga.run(context)
+        finally:
+            print(
+                f"Provisioning {request.server_name}: "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+        return context
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return self.create_saga.metrics()
+
+    async def _check_name(self, context: CreateContext):
+        await ensure_name_free(context.request.server_name)
+
+    async def _place(self, context: CreateContext):
+        context.node = await place_node()
+
+    async def _steam_token(self, context: CreateContext):
+        try:
+            context.server_steamid, context.srcd_token = await steam.get_srcds_token(
+                server_name=context.request.server_name
+            )
+        except HTTPException as e:
+            detail = e.detail if isinstance(e.detail, dict) else {}
+            raise ProvisioningError(
+                502, detail.get("msg") or detail.get("status") or "Steam API error", "error"
+            )
+
+    async def _return_token(self, context: CreateContext):
+        await steam.delete_srcds_token(context.server_steamid)
+
+    async def _reserve(self, context: CreateContext):
+        # Порт и строка сервера в одной транзакции: порт не уйдёт другому запросу
+        def reserve():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    port = docker_port.reserve(
+                        cur, context.node.id, context.request.server_name
+                    )
+                    if port is None:
+                        return None
+
+                    cur.execute(
+                        "INSERT INTO servers (name, ip, port, owner, static, node_id) VALUES (%s, %s, %s, %s, %s, %s)",
+                        (
+                            context.request.server_name,
+                            context.node.public_ip,
+                            port,
+                            context.owner,
+                            context.request.static,
+                            context.node.id,
+                        ),
+                    )
+                    return port
+
+        context.port = await asyncio.to_thread(reserve)
+        if context.port is None:
+            raise ProvisioningError(503, "No available ports")
+
+    async def _release(self, context: CreateContext):
+        def release():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "DELETE FROM servers WHERE name = %s AND port = %s",
+                        (context.request.server_name, context.port),
+                    )
+                    docker_port.release(cur, context.node.id, context.port)
+
+        await asyncio.to_thread(release)
+        server_registry.invalidate(context.request.server_name)
+
+    async def _attach_token(self, context: CreateContext):
+        def attach():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "UPDATE servers SET server_steamid = %s, srcd_token = %s WHERE name = %s",
+                        (
+                            context.server_steamid,
+                            context.srcd_token,
+                            context.request.server_name,
+                        ),
+                    )
+
+        await asyncio.to_thread(attach)
+
+    async def _docker_run(self, context: CreateContext):
+        request = context.request
+        config_staged = await asyncio.to_thread(artifact_cache.config_staged, context.node.id)
+        command = docker_run_command(
+            request.server_name,
+            context.srcd_token,
+            request.password,
+            context.port,
+            config_staged=config_staged,
+        )
+
+        result = await nodes.ssh(context.node).run(command)
+        if result.stderr:
+            # Контейнер мог успеть создаться: шаг не завершён, откатываем сами
+            await self._remove_container(context)
+            raise ProvisioningError(500, "SSH Error", "error")
+
+        await publish_lifecycle_event(request.server_name)
+
+    async def _remove_container(self, context: CreateContext):
+        await nodes.ssh(context.node).run(f"docker rm -f {context.request.server_name}")
+        await publish_lifecycle_event(context.request.server_name)
+
+    async def _wait_online(self, context: CreateContext):
+        server = await server_registry.wait_for(
+            context.request.server_name,
+            lambda status: status.status == "online",
+            timeout=settings.server_start_timeout,
+            probe_interval=settings.readiness_probe_interval,
+        )
+        if not server:
+            raise ProvisioningError(400, "Server not found in db", "error")
+
+        if server.status == "online":
+            context.server = server
+            return
+
+        raise ProvisioningError(408, "Request Timeout - server didn't start")
+
+
+provisioner = ServerProvisioner()
@@ -0,0 +1,50 @@
+from typing import Dict, List
+
+from core.single_flight import SingleFlight
+from core.config import get_settings
+from models.models import *
+
+import a2s
+
+
+settings = get_settings()
+
+
+class ServerQueryService:
+    """A2S_PLAYER / A2S_RULES с кэшем на сервер.
+
+    Повторные запросы в пределах TTL отдаются из кэша, конкурентные
+    запросы к одному серверу склеиваются в один UDP-запрос.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.queries = SingleFlight()
+
+    async def players(self, server: ServerOnline) -> List[PlayerItem]:
+        async def query():
+            players = await a2s.aplayers(
+                (server.ip, server.port), timeout=settings.a2s_timeout
+            )
+            return [
+                PlayerItem(name=player.name, score=player.score, duration=player.duration)
+                for player in players
+            ]
+
+        return await self.queries.do(
+            ("players", server.server_name), query, reuse_for=self.ttl
+        )
+
+    async def rules(self, server: ServerOnline) -> Dict[str, str]:
+        async def query():
+            rules = await a2s.arules(
+                (server.ip, server.port), timeout=settings.a2s_timeout
+            )
+            return {str(key): str(value) for key, value in rules.items()}
+
+        return await self.queries.do(
+            ("rules", server.server_name), query, reuse_for=self.ttl
+        )
+
+
+query_service = ServerQueryService(ttl=settings.a2s_details_ttl)
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from rcon.source import Client
+
+from core.config import get_settings
+
+import asyncio
+import re
+
+
+settings = get_settings()
+
+
+class RconBatcher:
+    """Склейка RCON-команд к одному серверу в одну посылку.
+
+    Команды к одному host:port, пришедшие в пределах rcon_batch_window,
+    уходят по одному TCP-соединению с одной аутентификацией вместо
+    нескольких. Каждая команда остаётся отдельным пакетом, поэтому
+    вызывающий получает ответ только на свою команду, и ошибка одной
+    команды не задевает остальные. Одинаковые команды в пачке выполняются
+    один раз.
+    """
+
+    def __init__(self, window: float, timeout: float):
+        self.window = window
+        self.timeout = timeout
+        self._pending: Dict[Tuple[str, int], List[Tuple[str, asyncio.Future]]] = {}
+        self._flushes: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.commands = 0
+
+    async def send(self, command: str, host: str, port: int) -> str:
+        key = (host, port)
+        future = asyncio.get_running_loop().create_future()
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            # Отправка в своей задаче: отмена первого вызывающего не теряет пачку
+            task = asyncio.create_task(self._flush(key))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+        batch.append((command, future))
+        self.commands += 1
+        return await asyncio.shield(future)
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "commands": self.commands,
+            "commands_per_batch": round(self.commands / self.batches, 2) if self.batches else 0.0,
+        }
+
+    async def _flush(self, key: Tuple[str, int]):
+        await asyncio.sleep(self.window)
+        batch = self._pending.pop(key)
+        self.batches += 1
+
+        commands = list(dict.fromkeys(command for command, _ in batch))
+        host, port = key
+        try:
+            replies = await asyncio.to_thread(self._run, host, port, commands)
+        except Exception as e:
+            # Не удалось подключиться или пройти аутентификацию
+            replies = {command: e for command in commands}
+
+        for command, future in batch:
+            if future.done():
+                continue
+            reply = replies[command]
+            if isinstance(reply, Exception):
+                future.set_exception(reply)
+            else:
+                future.set_result(reply)
+
+    def _run(self, host: str, port: int, commands: List[str]) -> Dict[str, Union[str, Exception]]:
+        replies: Dict[str, Union[str, Exception]] = {}
+        with Client(host, port, timeout=self.timeout, passwd=settings.rcon_password) as client:
+            for command in commands:
+                try:
+                    replies[command] = client.run(command)
+                except Exception as e:
+                    # Соединение оборвалось: остальные команды пачки не отправлены
+                    for rest in commands[len(replies):]:
+                        replies[rest] = e
+                    break
+        return replies
+
+
+def rcon_cvar(reply: str, name: str) -> Optional[str]:
+    """Значение cvar из ответа на запрос `<name>` без аргументов; None, если его нет."""
+    match = re.search(rf'^\s*"?{re.escape(name)}"?\s*=\s*(?:"([^"]*)"|(\S*))', reply or "", re.M)
+    if match is None:
+        return None
+    return match.group(1) if match.group(1) is not None else match.group(2)
+
+
+def rcon_failed(reply: str) -> bool:
+    """Движок не знает команду: строка ответа начинается с `Unknown command "`.
+
+    Обычный вывод консоли (имена карт и плагинов, эхо cvar) может содержать
+    любые слова, поэтому ищется только точный формат ошибки. Результат
+    самой команды (загрузилась ли карта) проверяется по её эффекту.
+    """
+    return any(
+        line.lstrip().startswith('Unknown command "') for line in (reply or "").splitlines()
+    )
+
+
+rcon_batch = RconBatcher(window=settings.rcon_batch_window, timeout=settings.rcon_timeout)
@@ -0,0 +1,328 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db.database import get_db_connection
+from core.single_flight import SingleFlight
+from services.probe_scheduler import ProbeScheduler
+from services.node_service import nodes
+from services.fleet_index import FleetIndex
+from services.status_store import ServerStatusRecord, StatusChange, StatusStore
+from core.config import get_settings
+
+import asyncio
+import dataclasses
+import hashlib
+import time
+import a2s
+import orjson
+
+
+settings = get_settings()
+
+ServerStatus = ServerStatusRecord
+
+
+class ServerRegistry:
+    """Внутрипроцессный доступ к серверам: строки из БД плюс кэш A2S-статусов.
+
+    Используется роутами и обработчиками вместо HTTP-запросов к
+    собственному /api/cs2/servers.
+    """
+
+    def __init__(self):
+        self.cache = StatusStore(ttl=settings.status_cache_ttl)
+        self.scans = SingleFlight()
+        self.scheduler = ProbeScheduler(
+            min_interval=settings.status_poll_interval,
+            max_interval=settings.probe_max_interval,
+            backoff_factor=settings.probe_backoff_factor,
+            max_per_second=settings.probe_max_per_second,
+        )
+        self._maps: List[Dict] = []
+        self._maps_loaded_at = 0.0
+        self._maps_etag = ""
+        self._fleet_view: Tuple[int, str, bytes] = (-1, "", b"")
+        self._fleet_index: Tuple[int, Optional[FleetIndex]] = (-1, None)
+
+    async def all(self) -> List[ServerStatus]:
+        snapshot = self.cache.snapshot()
+        if snapshot is not None:
+            return snapshot
+
+        return await self.scan(reuse_for=settings.scan_reuse_window)
+
+    async def by_owner(self, owner: str) -> List[ServerStatus]:
+        if self.cache.fresh():
+            return self.cache.by_owner(owner)
+
+        async def scan_owner():
+            servers = self._fetch_servers(owner=owner)
+            return await self._resolve(servers)
+
+        return await self.scans.do(
+            ("owner", owner), scan_owner, reuse_for=settings.scan_reuse_window
+        )
+
+    async def scan(self, reuse_for: float = 0.0) -> List[ServerStatus]:
+        """Опрос всего флота, результат становится текущим снимком.
+
+        Конкурентные вызовы ждут уже идущий опрос вместо запуска своего.
+        """
+        return await self.scans.do("all", self._scan, reuse_for=reuse_for)
+
+    async def _scan(self) -> List[ServerStatus]:
+        servers = self._fetch_servers()
+        names = [server["name"] for server in servers]
+        self.scheduler.retain(names)
+
+        states = await self._container_states()
+
+        # Лимит проб не распространяется на серверы без известного статуса
+        # и на серверы, у которых поменялось состояние контейнера
+        due = set(self.scheduler.due(names))
+        for server in servers:
+            cached = self.cache.peek(server["name"])
+            node_states = states.get(server["node_id"])
+            if cached is None or (
+                node_states is not None
+                and node_states.get(server["name"], "missing") != cached.container_state
+            ):
+                due.add(server["name"])
+
+        probed = await self._resolve(
+            [server for server in servers if server["name"] in due],
+            fresh=True,
+            states=states,
+        )
+        for status in probed:
+            self.scheduler.record(status.server_name, status)
+
+        probed_by_name = {status.server_name: status for status in probed}
+        statuses = [
+            probed_by_name.get(name) or self.cache.peek(name) for name in names
+        ]
+        self.cache.replace(statuses)
+        return statuses
+
+    def lifecycle_event(self, name: str):
+        """Сервер запускается/останавливается: опросить его в ближайший тик."""
+        self.scheduler.reset(name)
+        nodes.invalidate_states()
+
+    def container_event(self, name: str, node_id: int, state: Optional[str]):
+        """Событие docker events от лидера: контейнер запущен, упал или удалён.
+
+        Остановленный контейнер сразу отмечается offline, без A2S-опроса;
+        для запущенного статус подтвердит ближайшая проба.
+        """
+        nodes.apply_container_state(node_id, name, state)
+        self.scheduler.reset(name)
+
+        current = self.cache.peek(name)
+        if current is None:
+            return
+
+        if state == "running":
+            updated = dataclasses.replace(current, container_state=state)
+        else:
+            updated = ServerStatusRecord(
+                server_name=current.server_name,
+                owner=current.owner,
+                static=current.static,
+                online=False,
+                container_state=state or "missing",
+            )
+        self.cache.put(name, updated)
+
+    async def wait_for(
+        self,
+        name: str,
+        predicate: Callable[[ServerStatus], bool],
+        timeout: float,
+        probe_interval: Optional[float] = None,
+    ) -> Optional[ServerStatus]:
+        """Ждать, пока статус сервера не удовлетворит predicate.
+
+        Будится событиями docker events и снимками лидера. Если за
+        probe_interval ничего не пришло, сервер опрашивается сам (нужно для
+        готовности A2S после старта и как запасной путь без событий).
+        Возвращает последний статус; None, если сервера нет.
+        """
+        deadline = time.monotonic() + timeout
+        current = self.cache.peek(name) or await self.get(name, fresh=True)
+
+        while current is not None and not predicate(current):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            wait = remaining if probe_interval is None else min(remaining, probe_interval)
+            if await self.cache.wait_change(name, timeout=wait) or not probe_interval:
+                current = self.cache.peek(name)
+            else:
+                current = await self.get(name, fresh=True)
+
+        return current
+
+    async def get(self, name: str, fresh: bool = False) -> Optional[ServerStatus]:
+        if not fresh:
+            cached = self.cache.get(name)
+            if cached is not None:
+                return cached
+
+        servers = self._fetch_servers(name=name)
+        if not servers:
+            return None
+
+        statuses = await self._resolve(servers, fresh=fresh)
+        return statuses[0]
+
+    def maps(self) -> List[Dict]:
+        if time.monotonic() - self._maps_loaded_at > settings.maps_cache_ttl:
+            self._maps = self._fetch_maps()
+            self._maps_loaded_at = time.monotonic()
+            self._maps_etag = etag_for(orjson.dumps(self._maps))
+        return self._maps
+
+    def invalidate_maps(self):
+        self._maps_loaded_at = 0.0
+
+    def maps_etag(self) -> str:
+        self.maps()
+        return self._maps_etag
+
+    def fleet_view(self) -> Tuple[str, bytes]:
+        """Готовое JSON-тело текущего снимка и его строгий ETag.
+
+        Сериализация выполняется один раз на ревизию кэша. ETag считается
+        по содержимому, а не по номеру ревизии: ревизии у воркеров свои,
+        а ETag должен совпадать на любом из них.
+        """
+        revision = self.cache.revision
+        if self._fleet_view[0] != revision:
+            # Порядок вставки в кэш у воркеров разный: без сортировки разошёлся бы ETag
+            statuses = sorted(self.cache.current(), key=lambda status: status.server_name)
+            body = orjson.dumps([status.model_dump() for status in statuses])
+            self._fleet_view = (revision, etag_for(body), body)
+        return self._fleet_view[1], self._fleet_view[2]
+
+    def fleet_index(self) -> FleetIndex:
+        revision = self.cache.revision
+        if self._fleet_index[0] != revision:
+            self._fleet_index = (revision, FleetIndex(self.cache.current()))
+        return self._fleet_index[1]
+
+    def invalidate(self, name: str):
+        self.cache.discard(name)
+
+    async def _resolve(
+        self,
+        servers,
+        fresh: bool = False,
+        states: Optional[Dict[int, Optional[Dict[str, str]]]] = None,
+    ) -> List[ServerStatus]:
+        map_name_to_id = {map_item["name"]: map_item["map_id"] for map_item in self.maps()}
+        if states is None:
+            states = await self._container_states()
+
+        async def resolve_one(server):
+            if not fresh:
+                cached = self.cache.get(server["name"])
+                if cached is not None:
+                    return cached
+
+            node_states = states.get(server["node_id"])
+            container_state = node_states.get(server["name"]) if node_states is not None else None
+            status = await self._check_server_status(
+                server, map_name_to_id, node_states is not None, container_state
+            )
+            self.cache.put(server["name"], status)
+            return status
+
+        return await asyncio.gather(*(resolve_one(server) for server in servers))
+
+    async def _container_states(self) -> Dict[int, Optional[Dict[str, str]]]:
+        # Для недоступного по SSH хоста статус определяется только по A2S, как раньше
+        try:
+            return await nodes.container_states()
+        except Exception as e:
+            print(f"Couldn't load container states: {e}")
+            return {}
+
+    async def _check_server_status(
+        self, server, map_name_to_id, states_known=False, container_state=None
+    ) -> ServerStatus:
+        # Контейнер не запущен: A2S заведомо не ответит, не ждём таймаут
+        if states_known and container_state != "running":
+            return ServerStatusRecord(
+                server_name=server["name"],
+                owner=server["owner"],
+                static=server["static"],
+                online=False,
+                container_state=container_state or "missing",
+            )
+
+        try:
+            address = (server["ip"], server["port"])
+            info = await a2s.ainfo(address, timeout=settings.a2s_timeout)
+            # Карта из кэша хоста приходит как artifacts/<name>
+            map_id = map_name_to_id.get(info.map_name) or map_name_to_id.get(
+                info.map_name.rsplit("/", 1)[-1]
+            )
+            if map_id is None:
+                # Карты нет в maps: как и раньше, сервер считается выключенным
+                raise LookupError(info.map_name)
+
+            return ServerStatusRecord(
+                server_name=server["name"],
+                owner=server["owner"],
+                static=server["static"],
+                online=True,
+                ip=server["ip"],
+                port=server["port"],
+                map_id=map_id,
+                players_current=int(info.player_count),
+                players_max=info.max_players,
+                container_state=container_state,
+            )
+
+        except Exception as e:
+            return ServerStatusRecord(
+                server_name=server["name"],
+                owner=server["owner"],
+                static=server["static"],
+                online=False,
+                container_state=container_state,
+            )
+
+    def _fetch_servers(self, name=None, owner=None):
+        query = "SELECT name, ip, port, owner, static, node_id FROM servers"
+        params = ()
+
+        if name is not None:
+            query += " WHERE name = %s"
+            params = (name,)
+        elif owner is not None:
+            query += " WHERE owner = %s"
+            params = (owner,)
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                servers = cur.fetchall()
+                servers_columns = [desc[0] for desc in cur.description]
+                return [dict(zip(servers_columns, row)) for row in servers]
+
+    def _fetch_maps(self):
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT name, map_id, artifact_sha256, workshop_id FROM maps")
+                maps = cur.fetchall()
+                maps_columns = [desc[0] for desc in cur.description]
+                return [dict(zip(maps_columns, row)) for row in maps]
+
+
+def etag_for(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+server_registry = ServerRegistry()
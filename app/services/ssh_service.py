@@ -0,0 +1,113 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from core.config import get_settings
+
+import asyncio
+import asyncssh
+
+
+settings = get_settings()
+
+# Ошибки, после которых соединение считается мёртвым
+_CONNECTION_ERRORS = (asyncssh.DisconnectError, asyncssh.ChannelOpenError, ConnectionError)
+
+
+class SSHManager:
+    """Одно постоянное SSH-соединение с docker-хостом на воркер.
+
+    Соединение открывается при первой команде и переиспользуется; при
+    обрыве команда повторяется один раз на новом соединении.
+    """
+
+    def __init__(self, host: str, username: str, port: int = 22, client_keys=None):
+        self.host = host
+        self.username = username
+        self.port = port
+        self.client_keys = client_keys or ["ssh_key"]
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def connection(self) -> asyncssh.SSHClientConnection:
+        async with self._lock:
+            if self._conn is None:
+                self._conn = await asyncssh.connect(
+                    self.host,
+                    port=self.port,
+                    username=self.username,
+                    client_keys=self.client_keys,
+                    known_hosts=None,
+                    keepalive_interval=settings.ssh_keepalive_interval,
+                )
+            return self._conn
+
+    async def run(self, command: str) -> asyncssh.SSHCompletedProcess:
+        for attempt in range(2):
+            conn = await self.connection()
+            try:
+                return await conn.run(command)
+            except _CONNECTION_ERRORS:
+                self._drop(conn)
+                if attempt:
+                    raise
+
+    @asynccontextmanager
+    async def create_process(self, command: str, **kwargs) -> AsyncIterator[asyncssh.SSHClientProcess]:
+        """Долгоживущий процесс (docker events, docker logs -f) с переподключением.
+
+        Открытие канала повторяется один раз на новом соединении, как в run().
+        Если соединение оборвалось во время работы процесса, оно сбрасывается,
+        и следующий вызов откроет новое.
+        """
+        for attempt in range(2):
+            conn = await self.connection()
+            try:
+                process = await conn.create_process(command, **kwargs)
+                break
+            except _CONNECTION_ERRORS:
+                self._drop(conn)
+                if attempt:
+                    raise
+
+        try:
+            async with process:
+                yield process
+        except _CONNECTION_ERRORS:
+            self._drop(conn)
+            raise
+
+        # Канал закрылся без кода выхода и сигнала: оборвалось соединение
+        if process.exit_status is None and process.exit_signal is None:
+            self._drop(conn)
+
+    @asynccontextmanager
+    async def sftp(self) -> AsyncIterator[asyncssh.SFTPClient]:
+        """SFTP-сессия на постоянном соединении, с переподключением как в run()."""
+        for attempt in range(2):
+            conn = await self.connection()
+            try:
+                client = await conn.start_sftp_client()
+                break
+            except _CONNECTION_ERRORS:
+                self._drop(conn)
+                if attempt:
+                    raise
+
+        try:
+            async with client:
+                yield client
+        except (*_CONNECTION_ERRORS, asyncssh.SFTPConnectionLost):
+            self._drop(conn)
+            raise
+
+    async def close(self):
+        async with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                await self._conn.wait_closed()
+                self._conn = None
+
+    def _drop(self, conn):
+        if self._conn is conn:
+            self._conn = None
+        conn.close()
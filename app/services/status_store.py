@@ -0,0 +1,241 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from models.models import ServerOnline, ServerOffline
+
+import asyncio
+import sys
+import time
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+@dataclass(slots=True)
+class ServerStatusRecord:
+    """Компактная запись статуса сервера для долгоживущего кэша.
+
+    Повторяющиеся строки (владелец, адрес, состояние контейнера) интернируются,
+    поэтому на тысячах серверов хранится одна копия каждой. Атрибуты и
+    model_dump() совпадают с ServerOnline/ServerOffline.
+    """
+
+    server_name: str
+    owner: str
+    static: bool
+    online: bool
+    container_state: Optional[str] = None
+    ip: Optional[str] = None
+    port: Optional[int] = None
+    map_id: Optional[int] = None
+    players_current: Optional[int] = None
+    players_max: Optional[int] = None
+    updated_at: float = field(default=0.0, compare=False)
+
+    def __post_init__(self):
+        self.owner = _intern(self.owner)
+        self.ip = _intern(self.ip)
+        self.container_state = _intern(self.container_state)
+
+    @property
+    def status(self) -> str:
+        return "online" if self.online else "offline"
+
+    def model_dump(self) -> Dict:
+        data = {
+            "status": self.status,
+            "owner": self.owner,
+            "static": self.static,
+            "server_name": self.server_name,
+        }
+        if self.online:
+            data.update(
+                ip=self.ip,
+                port=self.port,
+                map_id=self.map_id,
+                players_current=self.players_current,
+                players_max=self.players_max,
+            )
+        data["container_state"] = self.container_state
+        return data
+
+    def to_model(self):
+        if self.online and self.map_id is not None:
+            return ServerOnline(**self.model_dump())
+        return ServerOffline(**self.model_dump())
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ServerStatusRecord":
+        return cls(
+            server_name=data["server_name"],
+            owner=data["owner"],
+            static=data.get("static", False),
+            online=data.get("status") == "online",
+            container_state=data.get("container_state"),
+            ip=data.get("ip"),
+            port=data.get("port"),
+            map_id=data.get("map_id"),
+            players_current=data.get("players_current"),
+            players_max=data.get("players_max"),
+        )
+
+
+# (старый статус, новый статус); None означает добавление или удаление
+StatusChange = Tuple[Optional[ServerStatusRecord], Optional[ServerStatusRecord]]
+
+
+class StatusStore:
+    """Кэш статусов флота со вторичными индексами по владельцу и статусу."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self.revision = 0
+        self._entries: Dict[str, ServerStatusRecord] = {}
+        self._by_owner: Dict[str, Set[str]] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        self._snapshot_at = 0.0
+        self._stale_until = 0.0
+        self.stale = False
+        self._listeners: List[Callable[[List[StatusChange], int], None]] = []
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+
+    def subscribe(self, listener: Callable[[List[StatusChange], int], None]):
+        self._listeners.append(listener)
+
+    def get(self, name: str) -> Optional[ServerStatusRecord]:
+        record = self._entries.get(name)
+        if record is None or time.monotonic() - record.updated_at > self.ttl:
+            return None
+        return record
+
+    def put(self, name: str, record: ServerStatusRecord):
+        record.updated_at = time.monotonic()
+        old = self._entries.get(name)
+        self._entries[name] = record
+        self._reindex(old, record)
+        if old != record:
+            self._emit([(old, record)])
+
+    def peek(self, name: str) -> Optional[ServerStatusRecord]:
+        """Последний известный статус без учёта TTL."""
+        return self._entries.get(name)
+
+    def discard(self, name: str):
+        record = self._entries.pop(name, None)
+        if record is not None:
+            self._reindex(record, None)
+            self._emit([(record, None)])
+
+    def current(self) -> List[ServerStatusRecord]:
+        """Все известные статусы, включая устаревшие."""
+        return list(self._entries.values())
+
+    def by_owner(self, owner: str) -> List[ServerStatusRecord]:
+        return [self._entries[name] for name in self._by_owner.get(owner, ())]
+
+    def by_status(self, status: str) -> List[ServerStatusRecord]:
+        return [self._entries[name] for name in self._by_status.get(status, ())]
+
+    def snapshot(self) -> Optional[List[ServerStatusRecord]]:
+        """Полный список статусов, если снимок флота ещё не устарел."""
+        if not self.fresh():
+            return None
+        return self.current()
+
+    def fresh(self) -> bool:
+        now = time.monotonic()
+        if self.stale and now < self._stale_until:
+            return True
+        return now - self._snapshot_at <= self.ttl
+
+    def restore(self, records: List[ServerStatusRecord], grace: float):
+        """Снимок из чекпоинта после рестарта.
+
+        Отдаётся как есть (с пометкой stale) в течение grace секунд или до
+        первого свежего снимка, чтобы не запускать холодный опрос флота.
+        """
+        self.replace(records, stale=True)
+        self._stale_until = time.monotonic() + grace
+
+    def replace(
+        self,
+        records: List[ServerStatusRecord],
+        version: Optional[int] = None,
+        stale: bool = False,
+    ):
+        now = time.monotonic()
+        old_entries = self._entries
+        self._entries = {}
+        self._by_owner = {}
+        self._by_status = {}
+        for record in records:
+            record.updated_at = now
+            self._entries[record.server_name] = record
+            self._reindex(None, record)
+
+        self._snapshot_at = now
+        was_stale, self.stale = self.stale, stale
+        if version is not None:
+            self.version = version
+
+        changes = []
+        for name, record in self._entries.items():
+            old = old_entries.get(name)
+            if old != record:
+                changes.append((old, record))
+        for name, record in old_entries.items():
+            if name not in self._entries:
+                changes.append((record, None))
+        # Пустое событие тоже нужно: подписчики снимают пометку stale
+        if changes or (was_stale and not stale):
+            self._emit(changes)
+
+    def touch(self):
+        """Лидер подтвердил, что снимок не изменился."""
+        now = time.monotonic()
+        for record in self._entries.values():
+            record.updated_at = now
+        self._snapshot_at = now
+        self.stale = False
+
+    def _reindex(self, old: Optional[ServerStatusRecord], new: Optional[ServerStatusRecord]):
+        if old is not None:
+            for index, key in ((self._by_owner, old.owner), (self._by_status, old.status)):
+                names = index.get(key)
+                if names is not None:
+                    names.discard(old.server_name)
+                    if not names:
+                        del index[key]
+        if new is not None:
+            self._by_owner.setdefault(new.owner, set()).add(new.server_name)
+            self._by_status.setdefault(new.status, set()).add(new.server_name)
+
+    async def wait_change(self, name: str, timeout: float) -> bool:
+        """Ждать изменения статуса сервера; False по таймауту."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(name, []).append(future)
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self._waiters.get(name)
+            if waiters is not None:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    del self._waiters[name]
+
+    def _emit(self, changes: List[StatusChange]):
+        self.revision += 1
+        for listener in self._listeners:
+            listener(changes, self.revision)
+
+        if self._waiters:
+            for old, new in changes:
+                for future in self._waiters.get((new or old).server_name, ()):
+                    if not future.done():
+                        future.set_result(None)
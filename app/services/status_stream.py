@@ -0,0 +1,125 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from services.server_registry import server_registry, StatusChange
+from core.config import get_settings
+
+import asyncio
+
+
+settings = get_settings()
+
+_RESYNC = object()
+
+
+class _Subscriber:
+    def __init__(self, owner: Optional[str], buffer_size: int):
+        self.owner = owner
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.resync = False
+
+    def wants(self, status) -> bool:
+        return self.owner is None or status.owner == self.owner
+
+
+class StatusBroadcaster:
+    """Рассылка изменений статусов серверов подписчикам SSE/WebSocket.
+
+    Каждый подписчик получает снимок, затем только изменения. Буфер на
+    подписчика ограничен: при переполнении очередь сбрасывается, новые
+    изменения не копятся, а клиенту отправляется свежий снимок.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self._subscribers: Set[_Subscriber] = set()
+        self._stale = False
+
+    def subscribe(self, owner: Optional[str] = None) -> _Subscriber:
+        subscriber = _Subscriber(owner, self.buffer_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, changes: List[StatusChange], revision: int):
+        stale = server_registry.cache.stale
+        # Первый свежий снимок после тёплого старта
+        freshened = self._stale and not stale
+        self._stale = stale
+
+        for subscriber in self._subscribers:
+            if subscriber.resync:
+                continue
+
+            diffs = [
+                diff
+                for old, new in changes
+                if subscriber.wants(new or old)
+                and (diff := self._diff(old, new)) is not None
+            ]
+            if not diffs and not freshened:
+                continue
+
+            try:
+                subscriber.queue.put_nowait(
+                    {"type": "delta", "revision": revision, "stale": stale, "changes": diffs}
+                )
+            except asyncio.QueueFull:
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(_RESYNC)
+                subscriber.resync = True
+
+    async def events(self, subscriber: _Subscriber) -> AsyncIterator[Optional[Dict]]:
+        """Снимок, затем дельты. None означает, что пора отправить keepalive."""
+        yield self.snapshot(subscriber.owner)
+
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=settings.status_stream_keepalive
+                )
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            if message is _RESYNC:
+                subscriber.resync = False
+                yield self.snapshot(subscriber.owner)
+            else:
+                yield message
+
+    def snapshot(self, owner: Optional[str] = None) -> Dict[str, Any]:
+        servers = [
+            status.model_dump()
+            for status in server_registry.cache.current()
+            if owner is None or status.owner == owner
+        ]
+        return {
+            "type": "snapshot",
+            "revision": server_registry.cache.revision,
+            "stale": server_registry.cache.stale,
+            "servers": servers,
+        }
+
+    @staticmethod
+    def _diff(old, new) -> Optional[Dict[str, Any]]:
+        if new is None:
+            return {"op": "remove", "server_name": old.server_name}
+        if old is None or old.status != new.status:
+            return {"op": "upsert", "server": new.model_dump()}
+
+        old_data = old.model_dump()
+        fields = {
+            key: value
+            for key, value in new.model_dump().items()
+            if old_data.get(key) != value
+        }
+        if not fields:
+            return None
+        return {"op": "update", "server_name": new.server_name, "fields": fields}
+
+
+status_broadcaster = StatusBroadcaster(buffer_size=settings.status_stream_buffer)
+server_registry.cache.subscribe(status_broadcaster.publish)
@@ -0,0 +1,234 @@
+from typing import Dict, List
+
+from psycopg.types.json import Jsonb
+
+from db.database import get_db_connection, get_conninfo
+from db.leader import leader
+from services.server_registry import server_registry, ServerStatus
+from services.status_store import ServerStatusRecord
+from services.history_service import sample_recorder
+from core.config import get_settings
+
+import asyncio
+import json
+import psycopg
+
+
+settings = get_settings()
+
+STATUS_CHANNEL = "server_status"
+LIFECYCLE_CHANNEL = "server_lifecycle"
+CONTAINER_CHANNEL = "container_event"
+
+
+def status_from_dict(data: Dict) -> ServerStatus:
+    return ServerStatusRecord.from_dict(data)
+
+
+class StatusPublisher:
+    """Запись снимка статусов в UNLOGGED-таблицу и NOTIFY для остальных воркеров."""
+
+    def __init__(self):
+        self._published: Dict[str, Dict] = {}
+        self._version = 0
+
+    def publish(self, statuses: List[ServerStatus]) -> int:
+        snapshot = {status.server_name: status.model_dump() for status in statuses}
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                if snapshot != self._published:
+                    cur.execute("SELECT COALESCE(MAX(version), 0) FROM server_status")
+                    self._version = max(cur.fetchone()[0], self._version) + 1
+
+                    changed = [
+                        (name, Jsonb(data), self._version)
+                        for name, data in snapshot.items()
+                        if self._published.get(name) != data
+                    ]
+                    if changed:
+                        cur.executemany(
+                            """
+                            INSERT INTO server_status (name, data, version, updated_at)
+                            VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                            ON CONFLICT (name) DO UPDATE SET
+                                data = EXCLUDED.data,
+                                version = EXCLUDED.version,
+                                updated_at = EXCLUDED.updated_at
+                            """,
+                            changed,
+                        )
+                    cur.execute(
+                        "DELETE FROM server_status WHERE NOT (name = ANY(%s))",
+                        (list(snapshot),),
+                    )
+                    self._published = snapshot
+
+                # NOTIFY уходит и без изменений: это сигнал, что снимок свежий
+                cur.execute(
+                    "SELECT pg_notify(%s, %s)", (STATUS_CHANNEL, str(self._version))
+                )
+
+        return self._version
+
+
+class StatusListener:
+    """LISTEN на канале статусов: держит локальную копию снимка в каждом воркере."""
+
+    def __init__(self):
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    get_conninfo(), autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {STATUS_CHANNEL}")
+                    await conn.execute(f"LISTEN {LIFECYCLE_CHANNEL}")
+                    await conn.execute(f"LISTEN {CONTAINER_CHANNEL}")
+
+                    async for notify in conn.notifies():
+                        if notify.channel == LIFECYCLE_CHANNEL:
+                            server_registry.lifecycle_event(notify.payload)
+                            continue
+                        if notify.channel == CONTAINER_CHANNEL:
+                            event = json.loads(notify.payload)
+                            server_registry.container_event(
+                                event["name"], event["node_id"], event["state"]
+                            )
+                            continue
+
+                        version = int(notify.payload)
+                        if version == server_registry.cache.version:
+                            server_registry.cache.touch()
+                        else:
+                            # Чтение снимка в потоке: цикл NOTIFY не блокирует воркер
+                            rows = await asyncio.to_thread(self._fetch)
+                            statuses = [status_from_dict(row) for row in rows]
+                            server_registry.cache.replace(statuses, version=version)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Status listener error: {e}")
+
+            await asyncio.sleep(settings.leader_retry_interval)
+
+    def _fetch(self) -> List[Dict]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT data FROM server_status ORDER BY name")
+                return [row[0] for row in cur.fetchall()]
+
+
+class StatusCheckpoint:
+    """Периодический чекпоинт снимка статусов для тёплого старта воркеров.
+
+    При старте снимок берётся из server_status (если лидер ещё жив или
+    Postgres не перезапускался), иначе из чекпоинта. До первого свежего
+    опроса он отдаётся с пометкой stale.
+    """
+
+    def __init__(self):
+        self._saved_revision = -1
+
+    def save(self):
+        revision = server_registry.cache.revision
+        if revision == self._saved_revision:
+            return
+
+        statuses = [status.model_dump() for status in server_registry.cache.current()]
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO server_status_checkpoint (id, data, saved_at)
+                    VALUES (1, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (id) DO UPDATE SET
+                        data = EXCLUDED.data,
+                        saved_at = EXCLUDED.saved_at
+                    """,
+                    (Jsonb(statuses),),
+                )
+        self._saved_revision = revision
+
+    def load(self) -> int:
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT data FROM server_status ORDER BY name")
+                    rows = [row[0] for row in cur.fetchall()]
+                    if not rows:
+                        cur.execute("SELECT data FROM server_status_checkpoint WHERE id = 1")
+                        row = cur.fetchone()
+                        rows = row[0] if row else []
+        except Exception as e:
+            print(f"Couldn't load status checkpoint: {e}")
+            return 0
+
+        if rows:
+            server_registry.cache.restore(
+                [status_from_dict(data) for data in rows],
+                grace=settings.status_warm_start_grace,
+            )
+        return len(rows)
+
+
+async def publish_lifecycle_event(server_name: str):
+    """Сбросить частоту опроса сервера у лидера после start/stop/create/delete."""
+    server_registry.lifecycle_event(server_name)
+    await asyncio.to_thread(_notify, LIFECYCLE_CHANNEL, server_name)
+
+
+async def publish_container_event(server_name: str, node_id: int, state):
+    """Состояние контейнера из docker events для всех воркеров."""
+    payload = json.dumps({"name": server_name, "node_id": node_id, "state": state})
+    await asyncio.to_thread(_notify, CONTAINER_CHANNEL, payload)
+
+
+def _notify(channel: str, payload: str):
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+
+
+status_publisher = StatusPublisher()
+status_listener = StatusListener()
+status_checkpoint = StatusCheckpoint()
+
+
+@leader.singleton("status_poller")
+async def poll_server_status():
+    while True:
+        try:
+            statuses = await server_registry.scan()
+            server_registry.cache.version = status_publisher.publish(statuses)
+            sample_recorder.record(statuses)
+        except Exception as e:
+            print(f"Status poller error: {e}")
+
+        await asyncio.sleep(settings.status_poll_interval)
+
+
+@leader.singleton("status_checkpoint")
+async def checkpoint_server_status():
+    while True:
+        await asyncio.sleep(settings.status_checkpoint_interval)
+        try:
+            status_checkpoint.save()
+        except Exception as e:
+            print(f"Status checkpoint error: {e}")
@@ -0,0 +1,251 @@
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from psycopg.types.json import Jsonb
+
+from db.database import get_db_connection
+from db.leader import leader
+from services.node_service import Node, nodes
+from core.config import get_settings
+
+import asyncio
+import json
+import re
+import time
+
+
+settings = get_settings()
+
+_SIZE_UNITS = {
+    "b": 1,
+    "kb": 1000,
+    "mb": 1000**2,
+    "gb": 1000**3,
+    "tb": 1000**4,
+    "kib": 1024,
+    "mib": 1024**2,
+    "gib": 1024**3,
+    "tib": 1024**4,
+}
+
+
+@dataclass
+class ContainerStats:
+    name: str
+    cpu_percent: float
+    mem_bytes: int
+    mem_limit: int
+    mem_percent: float
+    pids: int
+    updated_at: float = field(default=0.0, compare=False)
+
+
+@dataclass
+class HostMetrics:
+    node_id: int
+    cpu_used: float
+    mem_used: float
+    containers: List[Dict] = field(default_factory=list)
+    age: float = 0.0
+
+
+class TelemetryCollector:
+    """Сбор `docker stats` со всех хостов по постоянным SSH-каналам.
+
+    Работает у лидера: на каждый хост один поток `docker stats`, последние
+    значения держатся в памяти. Сводка по хостам раз в
+    telemetry_flush_interval пишется в UNLOGGED-таблицу node_metrics,
+    откуда её читают остальные воркеры для допуска создания серверов.
+    """
+
+    def __init__(self):
+        self._containers: Dict[int, Dict[str, ContainerStats]] = {}
+        self._streams: Dict[int, asyncio.Task] = {}
+
+    async def run(self):
+        try:
+            while True:
+                self._sync_streams()
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"Telemetry flush error: {e}")
+                await asyncio.sleep(settings.telemetry_flush_interval)
+        finally:
+            for task in self._streams.values():
+                task.cancel()
+            self._streams.clear()
+
+    def containers(self, node_id: int) -> List[ContainerStats]:
+        stale_after = settings.telemetry_stale_after
+        now = time.monotonic()
+        return [
+            stats
+            for stats in self._containers.get(node_id, {}).values()
+            if now - stats.updated_at <= stale_after
+        ]
+
+    async def host(self, node: Node) -> Optional[HostMetrics]:
+        load = await nodes.load(node)
+        containers = self.containers(node.id)
+        if load is None and not containers:
+            return None
+
+        # CPU хоста: сумма по контейнерам или loadavg, что больше
+        cpus = load.cpus if load else 1
+        cpu_used = sum(stats.cpu_percent for stats in containers) / (cpus * 100)
+        if load is not None:
+            cpu_used = max(cpu_used, 1.0 - load.cpu_headroom)
+            mem_used = 1.0 - load.mem_headroom
+        else:
+            limit = max((stats.mem_limit for stats in containers), default=0)
+            mem_used = sum(stats.mem_bytes for stats in containers) / limit if limit else 0.0
+
+        return HostMetrics(
+            node_id=node.id,
+            cpu_used=round(min(cpu_used, 1.0), 4),
+            mem_used=round(min(mem_used, 1.0), 4),
+            containers=[asdict(stats) for stats in containers],
+        )
+
+    async def flush(self):
+        enabled = [node for node in nodes.all() if node.enabled]
+        hosts = await asyncio.gather(*(self.host(node) for node in enabled))
+        rows = [
+            (host.node_id, host.cpu_used, host.mem_used, Jsonb(host.containers))
+            for host in hosts
+            if host is not None
+        ]
+        if not rows:
+            return
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO node_metrics (node_id, cpu_used, mem_used, containers, updated_at)
+                    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (node_id) DO UPDATE SET
+                        cpu_used = EXCLUDED.cpu_used,
+                        mem_used = EXCLUDED.mem_used,
+                        containers = EXCLUDED.containers,
+                        updated_at = EXCLUDED.updated_at
+                    """,
+                    rows,
+                )
+
+    def _sync_streams(self):
+        enabled = {node.id: node for node in nodes.all() if node.enabled}
+        for node_id in list(self._streams):
+            if node_id not in enabled:
+                self._streams.pop(node_id).cancel()
+                self._containers.pop(node_id, None)
+        for node_id, node in enabled.items():
+            task = self._streams.get(node_id)
+            if task is None or task.done():
+                self._streams[node_id] = asyncio.create_task(self._stream(node))
+
+    async def _stream(self, node: Node):
+        containers = self._containers.setdefault(node.id, {})
+        while True:
+            try:
+                async with nodes.ssh(node).create_process(
+                    "docker stats --no-trunc --format '{{json .}}'"
+                ) as process:
+                    async for line in process.stdout:
+                        stats = _parse_stats(line)
+                        if stats is not None:
+                            containers[stats.name] = stats
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Telemetry stream from {node.name} failed: {e}")
+
+            await asyncio.sleep(settings.leader_retry_interval)
+
+
+class TelemetryReader:
+    """Сводка по хостам из node_metrics для любого воркера, с коротким кэшем."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._hosts: Dict[int, HostMetrics] = {}
+        self._loaded_at = 0.0
+
+    def hosts(self) -> Dict[int, HostMetrics]:
+        if time.monotonic() - self._loaded_at > self.ttl:
+            self._hosts = self._fetch()
+            self._loaded_at = time.monotonic()
+        return self._hosts
+
+    def fresh_hosts(self) -> Dict[int, HostMetrics]:
+        return {
+            node_id: host
+            for node_id, host in self.hosts().items()
+            if host.age <= settings.telemetry_stale_after
+        }
+
+    def _fetch(self) -> Dict[int, HostMetrics]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT node_id, cpu_used, mem_used, containers,
+                        EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - updated_at)
+                    FROM node_metrics
+                    """
+                )
+                return {
+                    row[0]: HostMetrics(
+                        node_id=row[0],
+                        cpu_used=row[1],
+                        mem_used=row[2],
+                        containers=row[3],
+                        age=float(row[4]),
+                    )
+                    for row in cur.fetchall()
+                }
+
+
+def _parse_stats(line: str) -> Optional[ContainerStats]:
+    # Между кадрами docker stats выводит escape-коды очистки экрана
+    start = line.find("{")
+    if start < 0:
+        return None
+    try:
+        data = json.loads(line[start:])
+        mem_used, _, mem_limit = data["MemUsage"].partition("/")
+        return ContainerStats(
+            name=data["Name"],
+            cpu_percent=_parse_percent(data["CPUPerc"]),
+            mem_bytes=_parse_size(mem_used),
+            mem_limit=_parse_size(mem_limit),
+            mem_percent=_parse_percent(data["MemPerc"]),
+            pids=int(data.get("PIDs") or 0),
+            updated_at=time.monotonic(),
+        )
+    except (ValueError, KeyError):
+        return None
+
+
+def _parse_percent(value: str) -> float:
+    value = value.strip().rstrip("%")
+    return float(value) if value and value != "--" else 0.0
+
+
+def _parse_size(value: str) -> int:
+    match = re.match(r"\s*([\d.]+)\s*([a-zA-Z]*)", value)
+    if match is None:
+        return 0
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS.get(unit.lower() or "b", 1))
+
+
+telemetry = TelemetryCollector()
+telemetry_reader = TelemetryReader(ttl=settings.telemetry_cache_ttl)
+
+
+@leader.singleton("telemetry")
+async def collect_telemetry():
+    await telemetry.run()
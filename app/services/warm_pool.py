@@ -0,0 +1,458 @@
+from typing import Dict, List, Optional
+
+from services.provisioning import (
+    CreateContext,
+    ProvisioningError,
+    Saga,
+    Step,
+    docker_run_command,
+    ensure_name_free,
+    steam,
+    docker_port,
+    place_node,
+)
+from services.server_registry import server_registry
+from services.node_service import Node, nodes
+from services.status_sync import publish_lifecycle_event
+from services.rcon_batch import rcon_cvar
+from services.docker_events import docker_events
+from services.artifact_service import artifact_cache
+from db.database import get_db_connection
+from db.leader import leader
+from core.config import get_settings
+from models.models import *
+from rcon.source import rcon
+from cryptography.fernet import Fernet
+
+import asyncio
+import base64
+import hashlib
+import math
+import secrets
+import a2s
+
+
+settings = get_settings()
+
+# Символы, которые нельзя передать в sv_password через RCON без экранирования
+_UNSAFE_PASSWORD_CHARS = set('";\n\r')
+
+# Пароль сервера из пула хранится в БД зашифрованным, а не открытым текстом
+_password_cipher = Fernet(
+    base64.urlsafe_b64encode(
+        hashlib.sha256((settings.server_password_key or settings.secret_token).encode()).digest()
+    )
+)
+
+
+class PoolEmpty(ProvisioningError):
+    def __init__(self):
+        super().__init__(503, "Warm pool is empty")
+
+
+class WarmPool:
+    """Пул заранее запущенных контейнеров CS2 на зарезервированных портах.
+
+    При создании сервера контейнер из пула переименовывается, пароль
+    выставляется через RCON, владелец записывается в БД: без docker run,
+    скачивания конфига и загрузки игры. Пул пополняет лидер, целевой
+    размер считается по спросу на создание в этот час за прошлые дни.
+
+    Пул общий для всех хостов: контейнер пула запускается на хосте,
+    выбранном планировщиком размещения, и выдаётся вместе с ним.
+
+    В окружении контейнера остаётся случайный пароль пула, поэтому
+    запрошенный пароль хранится зашифрованным в servers.password_enc и выставляется заново
+    после каждого старта контейнера (по событию docker events у лидера).
+    """
+
+    def __init__(self, min_size: int, max_size: int):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.claim_saga = Saga(
+            "claim_server",
+            [
+                Step("check_name", self._check_name),
+                Step("claim", self._claim, self._discard, after=("check_name",)),
+                Step("rename", self._rename, after=("claim",)),
+                Step("set_password", self._set_password, after=("rename",)),
+                Step("assign", self._assign, self._unassign, after=("set_password",)),
+                Step("confirm_online", self._confirm_online, after=("assign",)),
+            ],
+        )
+        self.spawn_saga = Saga(
+            "spawn_pool_server",
+            [
+                Step("place", self._place),
+                Step("reserve", self._reserve, self._release, after=("place",)),
+                Step("steam_token", self._steam_token, self._return_token),
+                Step("docker_run", self._docker_run, self._remove_container, after=("reserve", "steam_token")),
+            ],
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    async def claim(self, request: CreateServerRequest, owner: str) -> Optional[CreateContext]:
+        """Выдать сервер из пула; None, если пул выключен или пуст."""
+        if not self.enabled or _UNSAFE_PASSWORD_CHARS & set(request.password):
+            return None
+
+        context = CreateContext(request=request, owner=owner)
+        try:
+            context.timings = await self.claim_saga.run(context)
+        except PoolEmpty:
+            return None
+        except ProvisioningError as e:
+            if e.status_code == 409:
+                raise
+            # Контейнер пула уже удалён компенсацией, создаём сервер обычным путём
+            print(f"Warm pool claim failed: {e.msg}")
+            return None
+        return context
+
+    def record_demand(self, pooled: bool):
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO server_creations (pooled) VALUES (%s)", (pooled,)
+                )
+
+    def target_size(self) -> int:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Среднее число созданий в этот час суток за последние дни
+                cur.execute(
+                    """
+                    SELECT COUNT(*)::float / %s FROM server_creations
+                    WHERE created_at > CURRENT_TIMESTAMP - make_interval(days => %s)
+                      AND EXTRACT(HOUR FROM created_at) = EXTRACT(HOUR FROM CURRENT_TIMESTAMP)
+                    """,
+                    (max(settings.warm_pool_demand_days, 1), settings.warm_pool_demand_days),
+                )
+                demand = cur.fetchone()[0]
+
+        return max(self.min_size, min(self.max_size, math.ceil(demand)))
+
+    async def maintain(self):
+        entries = self._entries()
+        booting = [entry for entry in entries if entry["state"] == "booting"]
+        ready = [entry for entry in entries if entry["state"] == "ready"]
+
+        # Выдача прервалась (воркер упал или запрос отменён): порт и контейнер освобождаются
+        for entry in entries:
+            if entry["state"] == "claimed" and entry["claim_age"] > settings.warm_pool_claim_timeout:
+                print(f"Warm pool: claim of {entry['name']} didn't finish, removing")
+                await self._discard(self._context_for(entry))
+
+        still_booting = 0
+        for entry in booting:
+            if await self._is_up(entry):
+                self._set_state(entry["name"], "ready")
+                ready.append(entry)
+            elif entry["age"] > settings.warm_pool_boot_timeout:
+                print(f"Warm pool: {entry['name']} didn't boot, removing")
+                await self._discard(self._context_for(entry))
+            else:
+                still_booting += 1
+
+        target = self.target_size()
+        active = len(ready) + still_booting
+
+        # По одному контейнеру за тик, чтобы не нагружать хост пачкой загрузок
+        if active < target:
+            context = CreateContext(
+                request=None, owner="", container=f"pool-{secrets.token_hex(4)}"
+            )
+            await self.spawn_saga.run(context)
+        elif active > target and ready:
+            oldest = max(ready, key=lambda entry: entry["age"])
+            await self._discard(self._context_for(oldest))
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {"claim": self.claim_saga.metrics(), "spawn": self.spawn_saga.metrics()}
+
+    async def _check_name(self, context: CreateContext):
+        await ensure_name_free(context.request.server_name)
+
+    async def _claim(self, context: CreateContext):
+        def claim():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        UPDATE warm_pool SET state = 'claimed', claimed_at = CURRENT_TIMESTAMP
+                        WHERE name = (
+                            SELECT name FROM warm_pool WHERE state = 'ready'
+                            ORDER BY created_at LIMIT 1 FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING name, port, server_steamid, srcd_token, node_id
+                        """
+                    )
+                    return cur.fetchone()
+
+        row = await asyncio.to_thread(claim)
+        if row is None:
+            raise PoolEmpty()
+        context.container, context.port, context.server_steamid, context.srcd_token, node_id = row
+        context.node = nodes.get(node_id)
+
+    async def _rename(self, context: CreateContext):
+        server_name = context.request.server_name
+        result = await nodes.ssh(context.node).run(
+            f"docker rename {context.container} {server_name}"
+        )
+        if result.stderr:
+            raise ProvisioningError(500, "SSH Error", "error")
+        context.container = server_name
+
+        def rename():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    # Зависшую выдачу maintain удаляет по имени контейнера
+                    cur.execute(
+                        "UPDATE warm_pool SET name = %s WHERE node_id = %s AND port = %s",
+                        (server_name, context.node.id, context.port),
+                    )
+
+        await asyncio.to_thread(rename)
+
+    async def restore_password(self, node: Node, action: str, name: str):
+        """После старта контейнера из пула вернуть пароль владельца."""
+        if action != "start":
+            return
+
+        try:
+            encrypted = await asyncio.to_thread(self._stored_password, name)
+            if encrypted is None:
+                return
+            password = _password_cipher.decrypt(encrypted.encode()).decode()
+
+            server = await server_registry.wait_for(
+                name,
+                lambda status: status.status == "online",
+                timeout=settings.server_start_timeout,
+                probe_interval=settings.readiness_probe_interval,
+            )
+            if server is None or server.status != "online":
+                print(f"Warm pool: {name} didn't come online, password not restored")
+                return
+
+            await self._send_password(node.public_ip, server.port, password)
+        except Exception as e:
+            print(f"Warm pool: couldn't restore password of {name}: {e}")
+
+    async def _set_password(self, context: CreateContext):
+        try:
+            await self._send_password(
+                context.node.public_ip, context.port, context.request.password
+            )
+        except Exception as e:
+            raise ProvisioningError(500, f"Couldn't set server password: {e}", "error")
+
+    async def _send_password(self, host: str, port: int, password: str):
+        # Без склейки с другими командами: ответ должен относиться только к sv_password
+        await asyncio.wait_for(
+            rcon(f'sv_password "{password}"', host=host, port=port, passwd=settings.rcon_password),
+            timeout=settings.rcon_timeout,
+        )
+
+        # Успех проверяется чтением значения, а не разбором ответа на установку
+        reply = await asyncio.wait_for(
+            rcon("sv_password", host=host, port=port, passwd=settings.rcon_password),
+            timeout=settings.rcon_timeout,
+        )
+        value = rcon_cvar(reply, "sv_password")
+        if value is None:
+            raise RuntimeError(f"Unexpected sv_password reply: {reply.strip()}")
+        # Защищённый cvar сервер может показывать звёздочками
+        masked = bool(value) and set(value) == {"*"}
+        if value != password and not (masked and password):
+            raise RuntimeError("sv_password was not applied")
+
+    async def _assign(self, context: CreateContext):
+        def assign():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "INSERT INTO servers (name, ip, port, owner, static, server_steamid, srcd_token, node_id, password_enc) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                        (
+                            context.request.server_name,
+                            context.node.public_ip,
+                            context.port,
+                            context.owner,
+                            context.request.static,
+                            context.server_steamid,
+                            context.srcd_token,
+                            context.node.id,
+                            _password_cipher.encrypt(context.request.password.encode()).decode(),
+                        ),
+                    )
+                    cur.execute(
+                        "UPDATE ports SET container_name = %s WHERE node_id = %s AND port = %s",
+                        (context.request.server_name, context.node.id, context.port),
+                    )
+                    cur.execute(
+                        "DELETE FROM warm_pool WHERE node_id = %s AND port = %s",
+                        (context.node.id, context.port),
+                    )
+
+        await asyncio.to_thread(assign)
+        await publish_lifecycle_event(context.request.server_name)
+
+    async def _unassign(self, context: CreateContext):
+        def unassign():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "DELETE FROM servers WHERE name = %s AND port = %s",
+                        (context.request.server_name, context.port),
+                    )
+
+        await asyncio.to_thread(unassign)
+        server_registry.invalidate(context.request.server_name)
+
+    async def _confirm_online(self, context: CreateContext):
+        server = await server_registry.get(context.request.server_name, fresh=True)
+        if server is None or server.status != "online":
+            raise ProvisioningError(503, "Pooled server didn't answer")
+        context.server = server
+
+    async def _place(self, context: CreateContext):
+        context.node = await place_node()
+
+    async def _reserve(self, context: CreateContext):
+        def reserve():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    port = docker_port.reserve(cur, context.node.id, context.container)
+                    if port is None:
+                        return None
+
+                    cur.execute(
+                        "INSERT INTO warm_pool (name, port, node_id) VALUES (%s, %s, %s)",
+                        (context.container, port, context.node.id),
+                    )
+                    return port
+
+        context.port = await asyncio.to_thread(reserve)
+        if context.port is None:
+            raise ProvisioningError(503, "No available ports")
+
+    async def _release(self, context: CreateContext):
+        def release():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "DELETE FROM warm_pool WHERE node_id = %s AND port = %s",
+                        (context.node.id, context.port),
+                    )
+                    docker_port.release(cur, context.node.id, context.port)
+
+        await asyncio.to_thread(release)
+
+    async def _steam_token(self, context: CreateContext):
+        context.server_steamid, context.srcd_token = await steam.get_srcds_token(
+            server_name=context.container
+        )
+
+    async def _return_token(self, context: CreateContext):
+        await steam.delete_srcds_token(context.server_steamid)
+
+    async def _docker_run(self, context: CreateContext):
+        def attach():
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "UPDATE warm_pool SET server_steamid = %s, srcd_token = %s WHERE name = %s",
+                        (context.server_steamid, context.srcd_token, context.container),
+                    )
+
+        await asyncio.to_thread(attach)
+
+        # Случайный пароль: незанятый сервер не должен быть открыт
+        config_staged = await asyncio.to_thread(artifact_cache.config_staged, context.node.id)
+        command = docker_run_command(
+            context.container,
+            context.srcd_token,
+            secrets.token_urlsafe(12),
+            context.port,
+            config_staged=config_staged,
+        )
+        result = await nodes.ssh(context.node).run(command)
+        if result.stderr:
+            await self._remove_container(context)
+            raise ProvisioningError(500, "SSH Error", "error")
+
+    async def _remove_container(self, context: CreateContext):
+        await nodes.ssh(context.node).run(f"docker rm -f {context.container}")
+
+    async def _discard(self, context: CreateContext):
+        await self._remove_container(context)
+        if context.server_steamid:
+            await self._return_token(context)
+        await self._release(context)
+
+    async def _is_up(self, entry: Dict) -> bool:
+        address = (nodes.get(entry["node_id"]).public_ip, entry["port"])
+        try:
+            await a2s.ainfo(address, timeout=settings.a2s_timeout)
+            return True
+        except Exception:
+            return False
+
+    def _entries(self) -> List[Dict]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT name, port, server_steamid, srcd_token, state, node_id,
+                        EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at) AS age,
+                        EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - claimed_at) AS claim_age
+                    FROM warm_pool
+                    """
+                )
+                rows = cur.fetchall()
+                columns = [desc[0] for desc in cur.description]
+                return [dict(zip(columns, row)) for row in rows]
+
+    def _stored_password(self, name: str) -> Optional[str]:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT password_enc FROM servers WHERE name = %s", (name,))
+                row = cur.fetchone()
+                return row[0] if row else None
+
+    def _set_state(self, name: str, state: str):
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE warm_pool SET state = %s WHERE name = %s", (state, name))
+
+    @staticmethod
+    def _context_for(entry: Dict) -> CreateContext:
+        return CreateContext(
+            request=None,
+            owner="",
+            container=entry["name"],
+            node=nodes.get(entry["node_id"]),
+            port=entry["port"],
+            server_steamid=entry["server_steamid"],
+            srcd_token=entry["srcd_token"],
+        )
+
+
+warm_pool = WarmPool(min_size=settings.warm_pool_min, max_size=settings.warm_pool_max)
+docker_events.subscribe(warm_pool.restore_password)
+
+
+@leader.singleton("warm_pool")
+async def maintain_warm_pool():
+    while True:
+        await asyncio.sleep(settings.warm_pool_refill_interval)
+        if not warm_pool.enabled:
+            continue
+        try:
+            await warm_pool.maintain()
+        except Exception as e:
+            print(f"Warm pool error: {e}")